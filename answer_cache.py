@@ -0,0 +1,210 @@
+import copy
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cache import TOOL_TTLS
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+#Cosine similarity a cached question needs to be considered the same question
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.8"))
+#Answers that used no tools are general knowledge and keep for a day
+DEFAULT_TTL = 24 * 60 * 60
+EMBEDDING_DIM = 512
+
+#Lifetime of answers from tools that do not cache their own results
+ANSWER_TTLS = dict(TOOL_TTLS, get_current_weather_many=TOOL_TTLS['get_current_weather'],
+                   search_flights=TOOL_TTLS['check_flights'])
+
+
+def seconds_until_midnight() -> float:
+    now = datetime.now()
+    return (datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds()
+
+
+def answer_ttl(tools_used: List[str]) -> Optional[float]:
+    """
+    How long an answer stays valid: the shortest lifetime of the tools it used (None: forever).
+    """
+    ttls = []
+    for tool in tools_used:
+        if tool == 'get_todays_date':
+            #"Today" changes at midnight
+            ttls.append(seconds_until_midnight())
+        elif ANSWER_TTLS.get(tool, DEFAULT_TTL) is not None:
+            ttls.append(ANSWER_TTLS.get(tool, DEFAULT_TTL))
+    if not tools_used:
+        return DEFAULT_TTL
+    return min(ttls) if ttls else None
+
+
+#Words that do not change what is being asked. Prepositions and operators are kept: "from London to New York"
+#and "from New York to London", or "10 + 3" and "10 - 3", are different questions.
+FILLER_WORDS = {'a', 'an', 'the', 'is', 'are', 'what', 'whats', 's', 'me', 'tell', 'can', 'you', 'i', 'please',
+                'thanks', 'hey', 'hi', 'could', 'would', 'does', 'know', 'like', 'want', 'let', 'current',
+                'currently', 'right', 'now'}
+TOKEN_PATTERN = re.compile(r"https?://\S+|[a-z0-9]+|[-+*/^%=<>]")
+
+
+def question_words(question: str) -> List[str]:
+    #The question's words, numbers and operators in order, without filler
+    return [token for token in TOKEN_PATTERN.findall(question.lower()) if token not in FILLER_WORDS]
+
+
+def _trigrams(term: str) -> set:
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def embed(words: List[str]) -> np.ndarray:
+    """
+    Hashed bag of word unigrams, word bigrams and character trigrams, L2-normalized. Questions that only differ
+    in a plural end up close together; a misspelt word changes most of its trigrams and usually does not.
+    """
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])] + [gram for word in words for gram in _trigrams(word)]
+    vector = np.zeros(EMBEDDING_DIM, np.float32)
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        #The top bit picks the sign, so unrelated features that share a bucket tend to cancel out
+        vector[h % EMBEDDING_DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def same_words(a: List[str], b: List[str]) -> bool:
+    """
+    Whether two questions have the same words in the same order, allowing for plurals ("flight" and "flights"
+    share most of their trigrams; "London" and "Londn" do not, so typos do not match). This keeps
+    "weather in London" and "weather in Paris", or flights from A to B and from B to A, apart however similar
+    their vectors are.
+    """
+    if len(a) != len(b):
+        return False
+    for left, right in zip(a, b):
+        if left != right:
+            #Numbers and operators have to match exactly
+            if not left.isalpha() or not right.isalpha():
+                return False
+            grams, other = _trigrams(left), _trigrams(right)
+            if len(grams & other) / len(grams | other) < 0.5:
+                return False
+    return True
+
+
+class AnswerCache:
+    """
+    Answers to earlier questions, looked up by the question's words in order (without filler) and its hashed n-gram embedding (nearest
+    neighbour by cosine similarity). Each answer expires with the shortest TTL of the tools it used, and the
+    least recently used answers are evicted once the cache is full.
+
+    Args:
+        size (int): Maximum number of answers kept, at least 1 (turn the cache off with ANSWER_CACHE=0 instead)
+        similarity (float): Minimum cosine similarity for a near match
+    """
+
+    def __init__(self, size: int = ANSWER_CACHE_SIZE, similarity: float = ANSWER_CACHE_SIMILARITY):
+        if size < 1:
+            raise ValueError(f"Answer cache size must be at least 1, got {size}")
+        self.size = size
+        self.similarity = similarity
+        self.vectors = np.zeros((size, EMBEDDING_DIM), np.float32)
+        #Slots in use, least recently used first, and what they hold
+        self.slots = OrderedDict()
+        self.by_question = {}
+        self.free = list(range(size - 1, -1, -1))
+        self.lock = threading.Lock()
+        self.counters = {'lookups': 0, 'hits': 0, 'near_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self.latency_saved = 0.0
+
+    def _drop(self, slot: int) -> None:
+        entry = self.slots.pop(slot)
+        self.by_question.pop(entry['key'], None)
+        self.vectors[slot] = 0
+        self.free.append(slot)
+
+    def get(self, question: str) -> Optional[Dict]:
+        """
+        Returns:
+            Optional[Dict]: A copy of the cached turn for this (or a near-identical) question, or None
+        """
+        words = question_words(question)
+        key = " ".join(words)
+        vector = embed(words)
+        now = time.time()
+        with self.lock:
+            self.counters['lookups'] += 1
+            slot = self.by_question.get(key)
+            near = False
+            if slot is None and self.slots:
+                scores = self.vectors @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity and best in self.slots and \
+                        same_words(self.slots[best]['words'], words):
+                    slot = best
+                    near = True
+            if slot is None:
+                self.counters['misses'] += 1
+                return None
+
+            entry = self.slots[slot]
+            if entry['expires_at'] is not None and entry['expires_at'] <= now:
+                self._drop(slot)
+                self.counters['expired'] += 1
+                self.counters['misses'] += 1
+                return None
+            self.slots.move_to_end(slot)
+            self.counters['hits'] += 1
+            self.counters['near_hits'] += near
+            self.latency_saved += entry['latency']
+            return copy.deepcopy(entry['turn'])
+
+    def put(self, question: str, turn: Dict, latency: float) -> None:
+        """
+        Cache the turn that answered a question. Failed turns are not cached.
+
+        Args:
+            question (str): The question
+            turn (Dict): What run_turn returned for it
+            latency (float): Seconds it took, counted as saved on every hit
+        """
+        if not isinstance(turn.get('response'), dict) or 'response' not in turn['response']:
+            return
+        if any(output is None for output in turn.get('tool_outputs', [])):
+            #A tool failed; the next ask may get a better answer
+            return
+        ttl = answer_ttl(turn.get('tools_used', []))
+        words = question_words(question)
+        key = " ".join(words)
+        with self.lock:
+            if key in self.by_question:
+                self._drop(self.by_question[key])
+            if not self.free:
+                self._drop(next(iter(self.slots)))
+                self.counters['evictions'] += 1
+            slot = self.free.pop()
+            self.vectors[slot] = embed(words)
+            self.slots[slot] = {'key': key, 'words': words, 'turn': copy.deepcopy(turn), 'latency': latency,
+                                'expires_at': None if ttl is None else time.time() + ttl}
+            self.by_question[key] = slot
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            Dict: Lookup counters, hit rate, entries and total latency saved in seconds
+        """
+        with self.lock:
+            stats = dict(self.counters, entries=len(self.slots), latency_saved=round(self.latency_saved, 3))
+        stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else None
+        return stats
+
+    def clear(self) -> None:
+        with self.lock:
+            for slot in list(self.slots):
+                self._drop(slot)
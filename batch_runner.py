@@ -0,0 +1,186 @@
+"""
+Run many questions through the agent and write one JSONL result per question.
+
+Each input line is {"question": ..., "id": optional, "context": optional}. Results ({"id", "question", "response",
+"tools_used", "tool_inputs", "tool_outputs", "elapsed", "stages", "error"}) are appended to the output file as
+they finish, so a run that stops can be restarted with the same arguments and continues where it left off. On
+restart, failed questions are tried again and their old records removed, so the file has one record per id.
+
+With --record, every response the agent gets over the network (LLM, weather, search, pages, flights,
+transcripts) is saved to a cassette directory; with --replay, they are served from it instead, so a run needs no
+network and gives the same results every time. --latency-scale 1 replays each response after its recorded latency.
+
+Usage:
+    python batch_runner.py questions.jsonl results.jsonl [--workers 8] [--engine prompt|functions]
+                           [--record CASSETTE | --replay CASSETTE [--latency-scale 0.0]]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional
+
+from cassette import Cassette, install
+from tracing import collect_spans, span, tracer
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+
+
+def use_cassette(cassette: Cassette, agent) -> None:
+    """
+    Make the agent's runs repeatable: all network traffic goes through the cassette, and so does the one tool
+    that depends on the clock.
+    """
+    install(cassette)
+    todays_date = agent.tool_registry.tools['get_todays_date']
+    agent.tool_registry.tools['get_todays_date'] = lambda: cassette.call("get_todays_date", {}, todays_date)
+    #Local tool-plan predictions depend on what earlier questions taught the router, which differs between runs
+    agent.ROUTER_ENABLED = False
+    #Every question goes through its own recorded calls, whatever was asked before it
+    agent.ANSWER_CACHE_ENABLED = False
+
+
+def read_questions(path: str) -> Iterator[Dict]:
+    with open(path) as f:
+        for number, line in enumerate(f):
+            if line.strip():
+                entry = json.loads(line)
+                entry.setdefault("id", number)
+                yield entry
+
+
+def resume_output(path: str) -> set:
+    """
+    Prepare the output of an earlier run to be continued: records of questions that failed, or lines cut short
+    when the run stopped, are removed (those questions are tried again), so the file keeps one record per id.
+
+    Returns:
+        set: Ids already answered
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    temporary = path + ".tmp"
+    dropped = 0
+    with open(path) as f, open(temporary, "w") as out:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                dropped += 1
+                continue
+            if result.get("error") or result["id"] in done:
+                dropped += 1
+                continue
+            done.add(result["id"])
+            out.write(line if line.endswith("\n") else line + "\n")
+    if dropped:
+        os.replace(temporary, path)
+    else:
+        os.remove(temporary)
+    return done
+
+
+def answer(run_turn: Callable, entry: Dict) -> Dict:
+    result = {"id": entry["id"], "question": entry["question"]}
+    start = time.perf_counter()
+    with collect_spans() as spans:
+        try:
+            with span("batch.question"):
+                turn = run_turn(entry["question"], entry.get("context", ""))
+            result.update(response=turn["response"], tools_used=turn["tools_used"], tool_inputs=turn["tool_inputs"],
+                          tool_outputs=turn["tool_outputs"])
+            if "error" in turn["response"]:
+                result["error"] = turn["response"]["error"]
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {str(e)}"
+    result["elapsed"] = time.perf_counter() - start
+
+    #Seconds spent per stage (LLM calls, each tool, decoding, ...) for this question
+    stages = {}
+    for finished in spans:
+        if finished.name != "batch.question":
+            stages[finished.name] = stages.get(finished.name, 0.0) + finished.duration
+    result["stages"] = {name: round(seconds, 6) for name, seconds in stages.items()}
+    return result
+
+
+def run_batch(questions: str, output: str, workers: int = BATCH_WORKERS, run_turn: Optional[Callable] = None) -> Dict:
+    """
+    Answer every question in the questions file that is not already answered in the output file.
+
+    Args:
+        questions (str): Input JSONL file
+        output (str): Output JSONL file, appended to
+        workers (int): Questions answered at the same time
+        run_turn (Callable): Engine to use (default: prompt_agent.run_turn)
+
+    Returns:
+        Dict: Counts of answered, failed and skipped questions, elapsed seconds and questions per second
+    """
+    if run_turn is None:
+        from prompt_agent import run_turn
+    done = resume_output(output)
+    counts = {"answered": 0, "failed": 0, "skipped": 0}
+    lock = threading.Lock()
+    #At most this many questions are read ahead of the workers, so the input file is never loaded whole
+    slots = threading.BoundedSemaphore(workers * 2)
+
+    def work(entry, out):
+        try:
+            result = answer(run_turn, entry)
+            line = json.dumps(result, ensure_ascii=False, default=str)
+            with lock:
+                out.write(line + "\n")
+                out.flush()
+                counts["failed" if result.get("error") else "answered"] += 1
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    with open(output, "a") as out, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        for entry in read_questions(questions):
+            if entry["id"] in done:
+                counts["skipped"] += 1
+                continue
+            slots.acquire()
+            pool.submit(work, entry, out)
+    elapsed = time.perf_counter() - start
+    finished = counts["answered"] + counts["failed"]
+    return dict(counts, elapsed=round(elapsed, 3), per_second=round(finished / elapsed, 2) if elapsed else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("questions")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--engine", choices=("prompt", "functions"), default="prompt")
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument("--record", help="Cassette directory to save every network response to")
+    recording.add_argument("--replay", help="Cassette directory to serve every network response from")
+    parser.add_argument("--latency-scale", type=float, default=0.0, help="Fraction of the recorded latency to wait when replaying")
+    args = parser.parse_args()
+
+    cassette = None
+    if args.record or args.replay:
+        #Tool results are cached in memory only, so every question in the run goes through the cassette
+        os.environ["TOOL_CACHE_PATH"] = ""
+        cassette = Cassette(args.record or args.replay, "record" if args.record else "replay", latency_scale=args.latency_scale)
+
+    import prompt_agent
+    if cassette is not None:
+        use_cassette(cassette, prompt_agent)
+    run_turn = prompt_agent.run_turn
+    if args.engine == "functions":
+        from function_agent import run_turn
+
+    try:
+        print(run_batch(args.questions, args.output, args.workers, run_turn))
+    finally:
+        if cassette is not None:
+            cassette.close()
+            print(f"Cassette: {cassette.stats()}")
+    print("\n" + tracer.report())
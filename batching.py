@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable, List
+
+
+class Coalescer:
+    """
+    Collects requests that arrive within a short window, from any thread, and fans them out together.
+
+    Each distinct key is fetched once per batch; a key that is already pending or in flight is not fetched
+    again, and every caller asking for it gets the same future.
+
+    Args:
+        fetch (Callable): Fetches the value for one key; exceptions are delivered through the key's future
+        window (float): Seconds to wait for more requests before starting a batch
+        max_workers (int): Maximum number of fetches in flight
+    """
+
+    def __init__(self, fetch: Callable[[Hashable], Any], window: float = 0.02, max_workers: int = 8):
+        self.fetch = fetch
+        self.window = window
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coalesce")
+        self.pending = {}
+        self.inflight = {}
+        self.timer = None
+        self.lock = threading.Lock()
+        self.batches = 0
+
+    def request(self, keys: Iterable[Hashable]) -> List[Future]:
+        """
+        Returns:
+            List[Future]: One future per key, in the order of keys
+        """
+        futures = []
+        with self.lock:
+            for key in keys:
+                future = self.pending.get(key) or self.inflight.get(key)
+                if future is None:
+                    future = self.pending[key] = Future()
+                futures.append(future)
+            if self.pending and self.timer is None:
+                self.timer = threading.Timer(self.window, self._flush)
+                self.timer.daemon = True
+                self.timer.start()
+        return futures
+
+    def _flush(self) -> None:
+        with self.lock:
+            batch = self.pending
+            self.pending = {}
+            self.timer = None
+            self.inflight.update(batch)
+            self.batches += 1
+        for key, future in batch.items():
+            self.executor.submit(self._run, key, future)
+
+    def _run(self, key: Hashable, future: Future) -> None:
+        try:
+            value = self.fetch(key)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(value)
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
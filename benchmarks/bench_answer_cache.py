@@ -0,0 +1,61 @@
+"""
+Replay a log of past questions through the answer cache and report how many turns it would have answered.
+
+Uses the same log as bench_intent_router.py. Each question's turn is taken to cost two LLM calls of its
+plan_latency; a hit is wrong if the cached answer was planned with different tools or inputs than the question needs.
+The log ends with rewordings of earlier questions: plurals (near hits) and a misspelt city (which must miss).
+
+Usage:
+    python benchmarks/bench_answer_cache.py [--log benchmarks/fixtures/questions.jsonl] [--size 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from answer_cache import AnswerCache
+from intent_router import normalize_plan
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "questions.jsonl"))
+    parser.add_argument("--size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(args.log) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    cache = AnswerCache(size=args.size)
+    wrong = 0
+    total = 0.0
+    lookup_time = 0.0
+    for entry in entries:
+        plan = entry.get("plan") or {}
+        latency = 2 * entry.get("plan_latency", 1.0)
+        total += latency
+
+        start = time.perf_counter()
+        cached = cache.get(entry["question"])
+        lookup_time += time.perf_counter() - start
+        if cached is not None:
+            if normalize_plan(dict(zip(cached["tools_used"], cached["tool_inputs"]))) != normalize_plan(plan):
+                wrong += 1
+            continue
+
+        turn = {"question": entry["question"], "response": {"response": "..."}, "tools_used": list(plan),
+                "tool_inputs": list(plan.values()), "tool_outputs": ["..."] * len(plan)}
+        cache.put(entry["question"], turn, latency)
+
+    stats = cache.stats()
+    print(f"questions: {len(entries)}, hits: {stats['hits']} (near: {stats['near_hits']}, wrong: {wrong}), "
+          f"expired: {stats['expired']}, entries: {stats['entries']}")
+    print(f"hit rate: {stats['hit_rate']:.0%}")
+    print(f"turn latency saved: {stats['latency_saved']:.1f}s of {total:.1f}s ({stats['latency_saved'] / total:.0%})")
+    print(f"lookup cost: {lookup_time / len(entries) * 1e6:.0f} us per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare the HTML-to-text extractors in extract.py on saved pages: throughput and peak memory per page.
+
+Usage:
+    python benchmarks/bench_extract.py [--fixtures benchmarks/fixtures] [--repeat 20] [--max-chars 2000]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extract import EXTRACTORS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    total_bytes = sum(len(html.encode()) for html in pages.values())
+
+    print(f"{len(pages)} pages, {total_bytes / 1024:.0f} KiB, {args.repeat} rounds\n")
+    print(f"{'extractor':<8} {'pages/s':>9} {'MiB/s':>8} {'peak KiB':>9}")
+    for name, extract in EXTRACTORS.items():
+        try:
+            extract("<html><body>warm up</body></html>", args.max_chars)
+        except ImportError as e:
+            print(f"{name:<8} skipped ({e})")
+            continue
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for html in pages.values():
+                extract(html, args.max_chars)
+        elapsed = time.perf_counter() - start
+
+        peak = 0
+        for html in pages.values():
+            tracemalloc.start()
+            extract(html, args.max_chars)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        rounds = args.repeat * len(pages)
+        print(f"{name:<8} {rounds / elapsed:>9.1f} {args.repeat * total_bytes / elapsed / 2 ** 20:>8.1f} {peak / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Check and time flights.FlightSearch against recorded Amadeus responses, replayed by flights.ReplayAmadeusClient.
+
+By default the recordings are generated here, written with flights.record_amadeus_responses and read back from the
+file, so the record/replay round trip is checked too. One leg has malformed offers (no price, no itineraries): only
+those offers may be skipped, the rest of that leg must still be returned. Then the search is timed with one worker
+and with --workers, each replayed call taking --latency seconds, and repeated to check legs come from the cache.
+
+--record PATH queries the real API (AMADEUS_API_KEY/AMADEUS_API_SECRET) for the same legs and saves the responses;
+--recordings PATH replays a saved file instead of generated offers.
+
+Usage:
+    python benchmarks/bench_flights.py [--latency 0.2] [--workers 4] [--record PATH | --recordings PATH]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import product
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import ToolCache
+from flights import FlightSearch, ReplayAmadeusClient, record_amadeus_responses
+
+ORIGINS = ["LON", "MAN"]
+DESTINATIONS = ["NYC", "BOS"]
+AIRLINES = ["BA", "AA", "VS", "DL", "UA"]
+#The leg whose recording has malformed offers
+BROKEN_LEG = "MAN-BOS"
+
+
+def make_offer(i, date):
+    departure = datetime.fromisoformat(date) + timedelta(hours=8 + i)
+    arrival = departure + timedelta(hours=7, minutes=5 * i)
+    return {
+        "itineraries": [{"duration": f"PT7H{5 * i}M", "segments": [
+            {"departure": {"at": departure.isoformat()}, "arrival": {"at": arrival.isoformat()}}]}],
+        "validatingAirlineCodes": [AIRLINES[i % len(AIRLINES)]],
+        "price": {"total": f"{400 + 37 * i:.2f}"},
+        "numberOfBookableSeats": 9 - i,
+    }
+
+
+def make_recordings(legs, per_leg):
+    recordings = {}
+    for origin, destination, date in legs:
+        offers = [make_offer(i, date) for i in range(per_leg)]
+        if f"{origin}-{destination}" == BROKEN_LEG:
+            del offers[1]["price"]
+            offers[2]["itineraries"] = []
+        recordings[f"{origin}-{destination}-{date}"] = offers
+    return recordings
+
+
+class DelayedReplayClient(ReplayAmadeusClient):
+    def __init__(self, recordings, latency):
+        super().__init__(recordings)
+        self.latency = latency
+
+    def get(self, *args, **params):
+        time.sleep(self.latency)
+        return super().get(*args, **params)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per replayed API call")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--per-leg", type=int, default=5)
+    parser.add_argument("--record", help="Record real API responses for the legs to this file, then replay them")
+    parser.add_argument("--recordings", help="Replay this recordings file instead of generated offers")
+    args = parser.parse_args()
+
+    first = datetime.now().date() + timedelta(days=30)
+    dates = [(first + timedelta(days=i)).isoformat() for i in range(args.days)]
+    legs = [(o, d, day) for o, d, day in product(ORIGINS, DESTINATIONS, dates) if o != d]
+
+    path = args.recordings or args.record or os.path.join(tempfile.mkdtemp(), "flight_offers.json")
+    failures = 0
+    if not args.recordings:
+        if args.record:
+            from tools import get_client
+            source = get_client("amadeus")
+        else:
+            source = ReplayAmadeusClient(make_recordings(legs, args.per_leg))
+        record_amadeus_responses(source, legs, path, max_per_leg=args.per_leg)
+        if not args.record and ReplayAmadeusClient(path).recordings != source.recordings:
+            failures += 1
+            print("recordings read back from the file differ from the ones recorded")
+
+    recordings = ReplayAmadeusClient(path).recordings
+    offers = sum(len(recordings.get(f"{o}-{d}-{day}", [])) for o, d, day in legs)
+    #Generated recordings have two malformed offers per broken leg
+    expected = None if args.recordings or args.record else offers - 2 * len(dates)
+
+    timings = {}
+    for workers in (1, args.workers):
+        client = DelayedReplayClient(recordings, args.latency)
+        search = FlightSearch(client=client, rate=1000, max_workers=workers, cache=ToolCache(path=None),
+                              max_per_leg=args.per_leg)
+        start = time.perf_counter()
+        table = search.search(ORIGINS, DESTINATIONS, dates)
+        timings[workers] = time.perf_counter() - start
+        calls = len(client.calls)
+
+        start = time.perf_counter()
+        again = search.search(ORIGINS, DESTINATIONS, dates)
+        cached = time.perf_counter() - start
+        print(f"{workers} worker(s): {len(legs)} legs, {calls} API calls, {len(table)} of {offers} offers in "
+              f"{timings[workers]:.2f}s; repeated search: {len(client.calls) - calls} API calls in {cached * 1000:.1f} ms")
+        if calls != len(legs) or len(client.calls) != calls or len(again) != len(table):
+            failures += 1
+            print("  every leg should be queried once and then served from the cache")
+        if expected is not None and len(table) != expected:
+            failures += 1
+            print(f"  expected {expected} offers: only the malformed ones may be skipped")
+
+    print(f"speedup with {args.workers} workers: {timings[1] / timings[args.workers]:.1f}x, {failures} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare the prompt-parsing engine (prompt_agent.run_turn) with native tool calling (function_agent.run_turn).
+
+A local HTTP server stands in for the chat completions API. It replies with each question's tool plan from the
+log, in the shape the engine asked for, and counts prompt tokens (messages plus tool schemas) and completion
+tokens for every request. Tools return canned outputs, so only the LLM side is compared.
+
+Usage:
+    python benchmarks/bench_function_calling.py [--log benchmarks/fixtures/questions.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+directory = tempfile.mkdtemp()
+os.environ.setdefault("TOOL_CACHE_PATH", os.path.join(directory, "tools.sqlite"))
+os.environ["ROUTER_MEMORY_PATH"] = os.path.join(directory, "intent_memory.json")
+#Every question goes through planning (and is not answered from the answer cache), so both engines do the same work
+os.environ["ROUTER_ENABLED"] = "0"
+os.environ["ANSWER_CACHE"] = "0"
+os.environ["PROMPT_TOKEN_LOG"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER = "Here is what I found, based on the tool outputs."
+TOOL_OUTPUTS = {
+    "get_current_weather": {"temperature": "61°F", "description": "light rain", "humidity": "80%", "wind_speed": "4 m/s"},
+    "get_todays_date": "10/18/26",
+    "get_youtube_transcript": [{"text": f"Segment {i} of the talk about caching.", "start": i * 5.0, "duration": 5.0} for i in range(40)],
+    "web_search": [f"Source: Result {i}\nSummary: A summary.\nContent: Some page text about the query.\n" + "-" * 50 for i in range(5)],
+    "check_flights": [{"price": "412.00", "departure": "2026-11-02T08:00:00", "arrival": "2026-11-02T11:05:00", "airline": "BA"}],
+}
+
+
+def make_llm_handler(plans, requests):
+    from prompts import count_message_tokens, count_tokens
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            messages = payload["messages"]
+            question = next(m["content"] for m in messages if m["role"] == "user").rsplit("Question: ", 1)[-1]
+            plan = plans.get(question) or {}
+
+            message = {"role": "assistant", "content": None}
+            if "tools" in payload or messages[-1]["role"] == "tool":
+                #Native tool calling: call every planned tool at once, then answer in plain text
+                if messages[-1]["role"] == "user" and plan:
+                    message["tool_calls"] = [
+                        {"id": f"call_{i}", "type": "function", "function": {"name": tool, "arguments": json.dumps(tool_input)}}
+                        for i, (tool, tool_input) in enumerate(plan.items())
+                    ]
+                else:
+                    message["content"] = ANSWER
+            elif plan and "You used the following tools" not in messages[-1]["content"]:
+                message["content"] = json.dumps({"tools": plan})
+            else:
+                message["content"] = json.dumps({"response": ANSWER})
+
+            prompt_tokens = count_message_tokens(messages) + (count_tokens(json.dumps(payload["tools"])) if "tools" in payload else 0)
+            completion_tokens = count_tokens(message["content"] or json.dumps(message["tool_calls"]))
+            requests.append((prompt_tokens, completion_tokens))
+            body = json.dumps({"choices": [{"message": message}],
+                               "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "questions.jsonl"))
+    args = parser.parse_args()
+
+    with open(args.log) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    plans = {entry["question"]: entry.get("plan") or {} for entry in entries}
+
+    import function_agent
+    import prompt_agent
+
+    requests = []
+    llm = ThreadingHTTPServer(("127.0.0.1", 0), make_llm_handler(plans, requests))
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+    prompt_agent.llm_client.url = f"http://127.0.0.1:{llm.server_port}/v1/chat/completions"
+    prompt_agent.run_tool = lambda tool, tool_input: TOOL_OUTPUTS.get(tool, {"result": "ok"})
+
+    print(f"questions: {len(entries)}")
+    for name, run_turn in (("prompt parsing", prompt_agent.run_turn), ("native tool calls", function_agent.run_turn)):
+        del requests[:]
+        answered = sum("response" in run_turn(entry["question"])["response"] for entry in entries)
+        prompt_tokens = sum(prompt for prompt, _ in requests)
+        completion_tokens = sum(completion for _, completion in requests)
+        print(f"{name:>18}: {len(requests) / len(entries):.2f} LLM calls per question, "
+              f"{prompt_tokens / len(entries):.0f} prompt + {completion_tokens / len(entries):.0f} completion tokens "
+              f"per question, answered {answered}/{len(entries)}")
+    llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Cold-start cost of the agent's modules, from python -X importtime in fresh interpreters.
+
+For each module, reports the median cumulative import time and the slowest top-level packages it pulls in, and
+checks that none of the SDKs the tools load on first use (LAZY_PACKAGES) is imported at startup. Exits with
+status 1 if one is, or if a module takes longer than --max-ms, so it can guard against cold-start regressions.
+
+Usage:
+    python benchmarks/bench_import_time.py [--modules tools prompt_agent server] [--runs 5] [--max-ms 0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Packages that tools.py only imports when a tool first needs them
+LAZY_PACKAGES = ("amadeus", "duckduckgo_search", "youtube_transcript_api", "bs4", "lxml")
+
+
+def import_times(code):
+    """
+    Returns:
+        dict[str, tuple[int, int]]: Imported module -> (self, cumulative) microseconds, for running code in a
+                                    fresh interpreter
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(f"{code} failed:\n{output.stderr[-2000:]}")
+    times = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        #Indentation shows nesting; top-level packages are the names without a dot
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=["tools", "prompt_agent", "server"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--max-ms", type=float, default=0, help="Fail if a module's median import takes longer (0: no limit)")
+    args = parser.parse_args()
+
+    #Imported by the interpreter itself before any of our code runs
+    startup = {name.split(".")[0] for name in import_times("pass")}
+    failed = False
+    for module in args.modules:
+        runs = [import_times(f"import {module}") for _ in range(args.runs)]
+        total = statistics.median(times[module][1] for times in runs) / 1000
+        packages = {}
+        for times in runs:
+            #A package's cost is its largest cumulative time in a run (the outermost import of it)
+            largest = {}
+            for name, (_, cumulative) in times.items():
+                package = name.split(".")[0]
+                largest[package] = max(largest.get(package, 0), cumulative)
+            for package, cumulative in largest.items():
+                packages.setdefault(package, []).append(cumulative)
+        costs = {name: statistics.median(values) / 1000 for name, values in packages.items()
+                 if name != module and name not in startup}
+        eager = sorted(name for name in packages if name in LAZY_PACKAGES)
+
+        print(f"{module}: {total:.0f} ms (median of {args.runs})")
+        for name, cost in sorted(costs.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {name:<28} {cost:7.1f} ms")
+        if eager:
+            print(f"  imported at startup, should be lazy: {', '.join(eager)}")
+            failed = True
+        if args.max_ms and total > args.max_ms:
+            print(f"  over the {args.max_ms:.0f} ms limit")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Replay a log of past questions through the intent router and report how often it predicts the LLM's tool plan.
+
+Each log line is {"question": ..., "plan": {tool: inputs} or null, "plan_latency": seconds, "tool_latency": optional
+seconds}. Questions are replayed in order, and the router learns each real plan after predicting, as it does in the
+agent.
+
+A skipped planning call saves its whole latency. A correct speculative prediction still waits for the planning
+call, so it only saves the tool time that overlapped it: min(plan_latency, tool_latency), as plan_tools counts it.
+Without a tool_latency in the log that is an upper bound, reported separately.
+
+Usage:
+    python benchmarks/bench_intent_router.py [--log benchmarks/fixtures/questions.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from intent_router import SKIP_CONFIDENCE, IntentRouter, normalize_plan
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "questions.jsonl"))
+    args = parser.parse_args()
+
+    with open(args.log) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    router = IntentRouter(path=None)
+    counts = {"skipped": 0, "wrong_skips": 0, "speculated": 0, "speculative_hits": 0, "no_prediction": 0}
+    saved = 0.0
+    overlapped = 0.0
+    planning = 0.0
+    predict_time = 0.0
+    for entry in entries:
+        plan = entry.get("plan") or {}
+        latency = entry.get("plan_latency", 1.0)
+        planning += latency
+
+        start = time.perf_counter()
+        prediction = router.predict(entry["question"])
+        predict_time += time.perf_counter() - start
+
+        correct = prediction is not None and normalize_plan(prediction.plan) == normalize_plan(plan)
+        if prediction is None:
+            counts["no_prediction"] += 1
+        elif prediction.confidence >= SKIP_CONFIDENCE:
+            counts["skipped"] += 1
+            if correct:
+                saved += latency
+            else:
+                counts["wrong_skips"] += 1
+        else:
+            counts["speculated"] += 1
+            if correct:
+                counts["speculative_hits"] += 1
+                overlapped += min(latency, entry.get("tool_latency", latency))
+        if plan:
+            router.learn(entry["question"], plan)
+
+    predicted = counts["skipped"] + counts["speculated"]
+    correct = counts["skipped"] - counts["wrong_skips"] + counts["speculative_hits"]
+    print(f"questions: {len(entries)}, predicted: {predicted}, correct: {correct}")
+    print(f"hit rate (of predictions): {correct / predicted:.0%}" if predicted else "hit rate: n/a")
+    print(f"planning calls skipped: {counts['skipped']} (wrong: {counts['wrong_skips']}), "
+          f"speculative: {counts['speculated']} (hits: {counts['speculative_hits']})")
+    print(f"planning latency saved by skipped calls: {saved:.1f}s of {planning:.1f}s ({saved / planning:.0%})")
+    print(f"tool time overlapped with planning by speculative hits: {overlapped:.1f}s ({overlapped / planning:.0%})")
+    print(f"router cost: {predict_time / len(entries) * 1e6:.0f} us per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Check and time json_extract.parse_llm_output on LLM replies.
+
+Valid replies (plain JSON, fenced, with prose around it, Python-literal style) must parse. Malformed ones (unhashable
+keys, deep nesting, unclosed objects) must come back as an error, never raise: the error is what triggers the
+repair re-prompt in prompt_agent. Then parsing time is reported per reply, whole and fed in streamed chunks.
+
+Usage:
+    python benchmarks/bench_json_extract.py [--rounds 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from json_extract import JsonObjectScanner, parse_llm_output
+
+VALID = [
+    '{"tools": {"get_current_weather": {"location": "London"}}}',
+    'Sure!\n```json\n{"tools": {"get_todays_date": ""}}\n```\nLet me know.',
+    '{"response": "It is 61\\u00b0F and raining in London, with \\"light\\" wind {not json}."}',
+    "{'tools': {'web_search': {'query': 'caching', 'num_results': 3}}}",
+    '{"response": "Done."} trailing notes {"ignored": true}',
+]
+MALFORMED = [
+    '{[1]: 2}',
+    '{' * 200 + '}' * 200,
+    '{"a": ' + '[' * 100000 + ']' * 100000 + '}',
+    '{' + '(' * 5000 + ')' * 5000 + '}',
+    '{"tools": {"get_current_weather": {"location": "London"}',
+    '{"response": 42, "tools": 7}',
+    'I could not decide which tools to use.',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    failures = 0
+    for text in VALID:
+        value, error = parse_llm_output(text)
+        if error is not None:
+            failures += 1
+            print(f"valid reply rejected: {text[:60]!r}: {error}")
+    for text in MALFORMED:
+        try:
+            value, error = parse_llm_output(text)
+        except Exception as e:
+            failures += 1
+            print(f"malformed reply raised {type(e).__name__}: {text[:60]!r}")
+            continue
+        if error is None:
+            failures += 1
+            print(f"malformed reply accepted: {text[:60]!r}: {value}")
+    print(f"{len(VALID)} valid and {len(MALFORMED)} malformed replies, {failures} failures")
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in VALID:
+            parse_llm_output(text)
+    whole = (time.perf_counter() - start) / (args.rounds * len(VALID))
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in VALID:
+            scanner = JsonObjectScanner()
+            for i in range(0, len(text), 8):
+                if scanner.feed(text[i:i + 8]) is not None:
+                    break
+    streamed = (time.perf_counter() - start) / (args.rounds * len(VALID))
+    print(f"parse: {whole * 1e6:.1f} us per reply, scan in 8-character chunks: {streamed * 1e6:.1f} us per reply")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
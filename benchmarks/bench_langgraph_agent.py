@@ -0,0 +1,87 @@
+"""
+Startup time and per-step latency of langgraph_agent_v1.py, with a fake chat model in place of OpenAI.
+
+Startup is measured in fresh interpreters (import of the module, then the first agent step, which builds the
+agent). Steps are timed from the graph's update stream: the fake model asks for two tools at once, then answers.
+
+Usage:
+    python benchmarks/bench_langgraph_agent.py [--imports 5] [--runs 20] [--llm-latency 0.0]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ["CHECKPOINT_PATH"] = os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite")
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+sys.path.insert(0, ROOT)
+
+
+def fake_llm(latency):
+    from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+    from langchain_core.messages import AIMessage
+
+    calls = [("random", {"text": "number"}, "call_1"), ("get_todays_date", {"text": "today"}, "call_2")]
+    plan = AIMessage(
+        content="",
+        tool_calls=[{"name": name, "args": args, "id": id_} for name, args, id_ in calls],
+        additional_kwargs={"tool_calls": [{"id": id_, "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+                                          for name, args, id_ in calls]},
+    )
+    return FakeMessagesListChatModel(responses=[plan, AIMessage(content="Here is your number and the date.")], sleep=latency or None)
+
+
+def time_imports(count):
+    code = ("import time; start = time.perf_counter(); import langgraph_agent_v1; imported = time.perf_counter();"
+            "import benchmarks.bench_langgraph_agent as bench; langgraph_agent_v1.llm = bench.fake_llm(0);"
+            "langgraph_agent_v1.get_agent_runnable(); print(imported - start, time.perf_counter() - imported)")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop("OPENAI_API_KEY", None)
+    results = []
+    for _ in range(count):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        results.append([float(value) for value in output.stdout.split()[-2:]])
+    return [statistics.median(values) for values in zip(*results)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--imports", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import_time, first_build = time_imports(args.imports)
+    print(f"import (median of {args.imports}): {import_time * 1000:.0f} ms, building the agent on first use: {first_build * 1000:.0f} ms")
+
+    import langgraph_agent_v1
+    langgraph_agent_v1.llm = fake_llm(args.llm_latency)
+
+    steps = {}
+    for run in range(args.runs):
+        config = {"configurable": {"thread_id": f"bench-{run}"}}
+        inputs = {"input": "give me a random number and today's date", "chat_history": []}
+        start = time.perf_counter()
+        #The action node prints every tool call; keep that out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            for update in langgraph_agent_v1.app.stream(inputs, config, stream_mode="updates"):
+                now = time.perf_counter()
+                for node in update:
+                    steps.setdefault(node, []).append(now - start)
+                start = now
+
+    for node, latencies in steps.items():
+        latencies.sort()
+        print(f"{node:>8}: {len(latencies)} steps, p50 {statistics.median(latencies) * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Check and time the streaming path (LLMClient.stream, ResponseStreamParser, prompt_agent.stream_llm_response)
+against a local server-sent events stand-in for the chat completions API.
+
+The reply is a JSON object whose "response" field has escapes (\\n, \\", \\\\), raw multi-byte characters and
+a \\uXXXX surrogate pair. It is streamed split at every position, so each escape is cut across deltas at some
+point, and each event is written in two pieces so multi-byte UTF-8 characters are split across reads too. Events
+after [DONE] are invalid and must never be read. The streamed text must equal the decoded field every time.
+
+Then: time to first text versus the whole reply with a delay between chunks, an error status, and a reply that
+only parses after the repair call.
+
+Usage:
+    python benchmarks/bench_llm_stream.py [--chunk-delay 0.02] [--chunks 40]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+directory = tempfile.mkdtemp()
+os.environ.setdefault("TOOL_CACHE_PATH", os.path.join(directory, "tools.sqlite"))
+os.environ["ROUTER_MEMORY_PATH"] = os.path.join(directory, "intent_memory.json")
+os.environ["PROMPT_TOKEN_LOG"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER = 'Line one\nTab\there, "quoted", back\\slash, café, naïve, 😀 and 𝄞 done.'
+#What the model writes: most characters raw (multi-byte UTF-8 on the wire), the emoji as a \uXXXX surrogate pair
+CONTENT = json.dumps({"response": ANSWER}, ensure_ascii=False).replace("😀", "\\ud83d\\ude00")
+
+
+def make_sse_handler(server_state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            scenario = server_state["scenario"]
+            if not payload.get("stream"):
+                #Only the repair call is not streamed
+                body = json.dumps({"choices": [{"message": {"role": "assistant", "content": CONTENT}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if scenario == "error":
+                body = b'{"error": {"message": "bad request"}}'
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for delta in server_state["deltas"]:
+                event = ("data: " + json.dumps({"choices": [{"delta": {"content": delta}}]}, ensure_ascii=False) + "\n\n").encode()
+                #Two writes per event, the first one ending inside a multi-byte character when there is one
+                cut = next((i for i, byte in enumerate(event) if byte >= 0x80), len(event) // 2) + 1
+                self.wfile.write(event[:cut])
+                self.wfile.flush()
+                self.wfile.write(event[cut:])
+                self.wfile.flush()
+                if server_state["delay"]:
+                    time.sleep(server_state["delay"])
+            self.wfile.write(b"data: [DONE]\n\ndata: {not json, must not be read\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def split(text, count):
+    size = max(1, -(-len(text) // count))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--chunks", type=int, default=40)
+    args = parser.parse_args()
+
+    import prompt_agent
+    from llm_client import LLMClient, ResponseStreamParser
+
+    state = {"scenario": "ok", "deltas": [], "delay": 0.0}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_sse_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+    client = LLMClient(api_key="test", url=url, max_retries=0)
+    prompt_agent.llm_client = client
+
+    #Every split point of the raw content, plus splitting it into single characters
+    splits = [[CONTENT[:i], CONTENT[i:]] for i in range(1, len(CONTENT))] + [list(CONTENT)]
+    failures = 0
+    start = time.perf_counter()
+    for deltas in splits:
+        state["deltas"] = deltas
+        stream_parser = ResponseStreamParser("response")
+        text = "".join(stream_parser.feed(delta) for delta in client.stream({"messages": []}))
+        if text != ANSWER or stream_parser.text != CONTENT:
+            failures += 1
+            print(f"mismatch for split {[len(d) for d in deltas][:4]}: {text!r}")
+    elapsed = time.perf_counter() - start
+    print(f"splits: {len(splits)} streams, {failures} mismatches, {elapsed / len(splits) * 1000:.2f} ms per stream")
+
+    state.update(deltas=split(CONTENT, args.chunks), delay=args.chunk_delay)
+    shown = []
+    arrivals = []
+
+    def on_text(text):
+        arrivals.append(time.perf_counter())
+        shown.append(text)
+
+    start = time.perf_counter()
+    response = prompt_agent.stream_llm_response("q", "", on_text=on_text)
+    total = time.perf_counter() - start
+    matches = "".join(shown) == ANSWER == response.get("response")
+    print(f"{args.chunks} chunks, {args.chunk_delay * 1000:.0f} ms apart: first text after {(arrivals[0] - start) * 1000:.0f} ms, "
+          f"whole reply after {total * 1000:.0f} ms, shown text {'matches' if matches else 'DIFFERS'}")
+    failures += not matches
+
+    state.update(scenario="error", delay=0.0)
+    response = prompt_agent.stream_llm_response("q", "", on_text=shown.append)
+    print(f"error status: {response}")
+    failures += response != {"error": "No valid response from model"}
+
+    #A reply cut off inside the object: the repair call returns the whole object, and on_text gets the rest of it
+    state.update(scenario="ok", deltas=split(CONTENT[:30], 3))
+    shown = []
+    response = prompt_agent.stream_llm_response("q", "", on_text=shown.append)
+    repaired = "".join(shown) == ANSWER == response.get("response")
+    print(f"repaired reply: {'shown in full' if repaired else 'NOT shown: ' + repr(''.join(shown))}")
+    failures += not repaired
+
+    server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare the old serial page download path of web_search against fetch.fetch_pages.
+
+A local HTTP server stands in for the search result pages, each response delayed by --latency seconds.
+
+Usage:
+    python benchmarks/bench_web_search.py [--pages 5] [--latency 0.3] [--no-sleep]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetch import HostRateLimiter, fetch_pages
+
+PAGE = ("<html><body>" + "<p>Travel guide paragraph with some text.</p>" * 2000 + "</body></html>").encode()
+
+
+def make_handler(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serial_fetch(urls, sleep):
+    #Mirrors the original web_search loop: politeness sleep + a fresh requests.get per result
+    pages = []
+    for url in urls:
+        if sleep:
+            time.sleep(random.uniform(1, 3))
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        pages.append(response.text)
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--no-sleep", action="store_true", help="leave out the 1-3s politeness sleep of the serial path")
+    args = parser.parse_args()
+
+    servers = []
+    urls = []
+    #One server per result so the per-host limiter sees distinct hosts, as with real search hits
+    for i in range(args.pages):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        urls.append(f"http://127.0.0.1:{server.server_port}/page/{i}")
+
+    start = time.perf_counter()
+    serial_fetch(urls, sleep=not args.no_sleep)
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pages = fetch_pages(urls, limiter=HostRateLimiter())
+    pooled_time = time.perf_counter() - start
+
+    for server in servers:
+        server.shutdown()
+
+    print(f"pages: {args.pages}, latency per page: {args.latency}s, fetched: {sum(p is not None for p in pages)}")
+    print(f"serial:   {serial_time:.3f}s")
+    print(f"pooled:   {pooled_time:.3f}s")
+    print(f"speedup:  {serial_time / pooled_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Load test for server.py with mocked LLM and tool backends.
+
+A local HTTP server stands in for the chat completions API (plan, then answer), and the weather lookup is
+replaced by a sleep, so the numbers reflect the agent's own concurrency rather than upstream services.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 50] [--questions 4] [--llm-latency 0.05] [--tool-latency 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+directory = tempfile.mkdtemp()
+os.environ.setdefault("TOOL_CACHE_PATH", os.path.join(directory, "tools.sqlite"))
+os.environ["ROUTER_MEMORY_PATH"] = os.path.join(directory, "intent_memory.json")
+#Every turn plans and runs its tools: no speculative lookups from the router, no answers from the answer cache
+os.environ["ROUTER_ENABLED"] = "0"
+os.environ["ANSWER_CACHE"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_llm_handler(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            message = payload["messages"][-1]["content"]
+            time.sleep(latency)
+            if "You used the following tools" in message:
+                content = json.dumps({"response": "It is mild and sunny."})
+            else:
+                city = message.rsplit("weather in ", 1)[-1].rstrip("?")
+                content = json.dumps({"tools": {"get_current_weather": {"location": city}}})
+            body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+async def client(port, session, questions, latencies, statuses):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    session_id = f"load-{session}"
+    for i in range(questions):
+        body = json.dumps({"session_id": session_id, "question": f"What is the weather in City{session}x{i}?"}).encode()
+        start = time.perf_counter()
+        writer.write(f"POST /ask HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        statuses.append(status)
+    writer.close()
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))]
+
+
+async def run(args):
+    import prompt_agent
+    import tools
+    from server import AgentServer
+    from tracing import tracer
+
+    llm = ThreadingHTTPServer(("127.0.0.1", 0), make_llm_handler(args.llm_latency))
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+    prompt_agent.llm_client.url = f"http://127.0.0.1:{llm.server_port}/v1/chat/completions"
+
+    def fake_weather(location):
+        time.sleep(args.tool_latency)
+        return {"temperature": "18°F", "description": "clear sky", "humidity": "40%", "wind_speed": "3 m/s"}
+    tools._fetch_weather = fake_weather
+
+    agent_server = AgentServer(workers=args.workers, max_pending=args.max_pending)
+    server = await agent_server.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    latencies = []
+    statuses = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, session, args.questions, latencies, statuses) for session in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    server.close()
+    llm.shutdown()
+
+    ok = [latency for latency, status in zip(latencies, statuses) if status == 200]
+    print(f"sessions: {args.sessions}, questions each: {args.questions}, workers: {args.workers}")
+    print(f"completed: {len(ok)}, rejected: {statuses.count(503)}, errors: {len(statuses) - len(ok) - statuses.count(503)}")
+    print(f"throughput: {len(ok) / elapsed:.1f} turns/s over {elapsed:.2f}s")
+    if ok:
+        print(f"latency p50: {percentile(ok, 50) * 1000:.0f} ms, p99: {percentile(ok, 99) * 1000:.0f} ms")
+    print("\n" + tracer.report())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--tool-latency", type=float, default=0.1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
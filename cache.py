@@ -0,0 +1,201 @@
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tracing import annotate
+
+CACHE_PATH = os.getenv("TOOL_CACHE_PATH", os.path.join(".cache", "tools.sqlite"))
+MEMORY_ENTRIES = int(os.getenv("TOOL_CACHE_MEMORY_ENTRIES", "256"))
+
+#Seconds each tool's results stay fresh. None means the result never expires.
+TOOL_TTLS = {
+    'get_current_weather': 10 * 60,
+    'check_flights': 60 * 60,
+    'get_youtube_transcript': None,
+    'web_search': 60 * 60,
+}
+
+
+class _Call:
+    #An upstream call that is in flight; concurrent callers with the same key wait on it
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ToolCache:
+    """
+    Two-tier cache for tool results: a bounded in-memory LRU in front of a SQLite table on disk.
+
+    Args:
+        path (str): SQLite file for the disk tier, or None to keep everything in memory
+        max_entries (int): Maximum number of entries kept in the memory tier
+    """
+
+    def __init__(self, path: Optional[str] = CACHE_PATH, max_entries: int = MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.inflight = {}
+        self.counters = Counter()
+        self.lock = threading.RLock()
+        self.db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.db is None:
+            if self.path and os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, tool TEXT, expires_at REAL, value TEXT)")
+            self.db.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+            self.db.commit()
+        return self.db
+
+    def _remember(self, key: str, expires_at: Optional[float], value: Any) -> None:
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a key in memory first, then on disk.
+
+        Returns:
+            Tuple[bool, Any]: (found, value)
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self.memory.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return True, value
+                del self.memory[key]
+                self.counters['expired'] += 1
+
+            row = self._connect().execute("SELECT expires_at, value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                expires_at, value = row[0], json.loads(row[1])
+                if expires_at is None or expires_at > now:
+                    self._remember(key, expires_at, value)
+                    self.counters['hits'] += 1
+                    self.counters['disk_hits'] += 1
+                    return True, value
+                self.counters['expired'] += 1
+
+            self.counters['misses'] += 1
+            return False, None
+
+    def set(self, key: str, tool: str, value: Any, ttl: Optional[float]) -> None:
+        expires_at = None if ttl is None else time.time() + ttl
+        with self.lock:
+            self._remember(key, expires_at, value)
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO cache (key, tool, expires_at, value) VALUES (?, ?, ?, ?)",
+                       (key, tool, expires_at, json.dumps(value)))
+            db.commit()
+
+    def get_or_call(self, key: str, tool: str, ttl: Optional[float], fn: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, or call fn to compute it.
+
+        Only one call to fn runs per key at a time; concurrent callers with the same key wait for it
+        and share its result. None results are treated as failures and are not cached.
+        """
+        found, value = self.get(key)
+        annotate(cache_hit=found)
+        if found:
+            return value
+
+        with self.lock:
+            call = self.inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self.inflight[key] = _Call()
+            else:
+                self.counters['deduplicated'] += 1
+                annotate(deduplicated=True)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            if call.value is not None:
+                self.set(key, tool, call.value, ttl)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            call.event.set()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Counters for hits, disk_hits, misses, expired, evictions and deduplicated calls
+        """
+        with self.lock:
+            stats = {name: self.counters[name] for name in ('hits', 'disk_hits', 'misses', 'expired', 'evictions', 'deduplicated')}
+            stats['memory_entries'] = len(self.memory)
+            return stats
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memory.clear()
+            self._connect().execute("DELETE FROM cache")
+            self.db.commit()
+
+
+tool_cache = ToolCache()
+
+
+def normalize_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    #Default key normalization: surrounding whitespace and letter case do not make a new request
+    return {name: value.strip().casefold() if isinstance(value, str) else value for name, value in arguments.items()}
+
+
+def make_key(tool: str, arguments: Dict[str, Any]) -> str:
+    return tool + ":" + json.dumps(arguments, sort_keys=True, default=str)
+
+
+def cached(tool: str, ttl: Optional[float] = None, normalize: Callable[[Dict[str, Any]], Dict[str, Any]] = normalize_arguments,
+           cache: Optional[ToolCache] = None):
+    """
+    Decorator that caches a tool's results, keyed on its normalized arguments.
+
+    Args:
+        tool (str): Tool name, used in the cache key
+        ttl (float): Seconds results stay fresh, or None to keep them forever
+        normalize (Callable): Maps the bound arguments (defaults applied) to the values that make up the key
+        cache (ToolCache): Cache to use (default: the shared tool_cache)
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_key(tool, normalize(dict(bound.arguments)))
+            return (cache or tool_cache).get_or_call(key, tool, ttl, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
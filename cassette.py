@@ -0,0 +1,320 @@
+"""
+Record/replay layer for everything the agent sends over the network.
+
+A cassette is a directory with two files:
+    records.bin  zlib-compressed records, appended one after another
+    index.bin    record hashes (sorted), offsets and lengths, read through a memory map when replaying
+
+HTTP requests on the shared session (LLM API, weather, web pages) are recorded by CassetteAdapter; the SDK clients
+that bring their own transport (Amadeus, DuckDuckGo, YouTube transcripts) are wrapped by install(). Requests are
+keyed on a hash of their method, URL without credentials and body, so cassettes hold no API keys.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+#Query parameters left out of request keys, so recordings replay without (and do not contain) credentials
+SECRET_PARAMS = {'appid', 'api_key', 'apikey', 'key', 'token', 'access_token', 'client_secret'}
+#Response headers not kept: the body is stored decoded, and cookies are not needed to replay
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'set-cookie'}
+
+_INDEX_HEADER = struct.Struct('<4sIQ')
+_INDEX_MAGIC = b'CASS'
+
+
+class CassetteMiss(KeyError):
+    pass
+
+
+class RecordedError(Exception):
+    #Replayed in place of an exception the real call raised while recording
+    pass
+
+
+def request_hash(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def strip_secrets(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name.lower() not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+class Cassette:
+    """
+    Args:
+        path (str): Cassette directory
+        mode (str): "record" to call through and save every response, "replay" to only serve saved ones
+        latency_scale (float): When replaying, sleep this fraction of each response's recorded latency (0: no delay)
+        latency (float): When replaying, extra seconds to sleep per response
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 0.0, latency: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.counters = {'recorded': 0, 'duplicates': 0, 'replayed': 0, 'missing': 0, 'bytes_written': 0}
+        self.records_path = os.path.join(path, "records.bin")
+        self.index_path = os.path.join(path, "index.bin")
+        self.hashes, self.offsets, self.lengths = self._load_index()
+        self.records = None
+        self.pending = {}
+
+        if mode == "record":
+            os.makedirs(path, exist_ok=True)
+            #New records go at the end of the file; the index is rewritten (merged) when the cassette is saved
+            self.file = open(self.records_path, "ab")
+        elif os.path.exists(self.records_path) and os.path.getsize(self.records_path):
+            with open(self.records_path, "rb") as f:
+                self.records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_index(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not os.path.exists(self.index_path):
+            return np.zeros(0, np.uint64), np.zeros(0, np.uint64), np.zeros(0, np.uint32)
+        with open(self.index_path, "rb") as f:
+            magic, version, count = _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size))
+        if magic != _INDEX_MAGIC or version != 1:
+            raise ValueError(f"Not a cassette index: {self.index_path}")
+        #Three memory-mapped sections, so a lookup only touches the pages its binary search visits
+        offset = _INDEX_HEADER.size
+        hashes = np.memmap(self.index_path, np.uint64, "r", offset, (count,)) if count else np.zeros(0, np.uint64)
+        offsets = np.memmap(self.index_path, np.uint64, "r", offset + 8 * count, (count,)) if count else np.zeros(0, np.uint64)
+        lengths = np.memmap(self.index_path, np.uint32, "r", offset + 16 * count, (count,)) if count else np.zeros(0, np.uint32)
+        return hashes, offsets, lengths
+
+    def _read(self, offset: int, length: int) -> Tuple[Dict, bytes]:
+        data = self.records[offset:offset + length]
+        meta, _, body = zlib.decompress(data).partition(b"\0")
+        return json.loads(meta), body
+
+    def lookup(self, key: str) -> Optional[Tuple[Dict, bytes]]:
+        """
+        Find the record for a request hash.
+
+        Returns:
+            Optional[Tuple[Dict, bytes]]: (metadata, body), or None if it was not recorded
+        """
+        short = np.uint64(int(key[:16], 16))
+        i = int(np.searchsorted(self.hashes, short))
+        if i < len(self.hashes) and self.hashes[i] == short:
+            meta, body = self._read(int(self.offsets[i]), int(self.lengths[i]))
+            #The index holds 64 bits of the hash; the record keeps all of it
+            if meta.get("key") == key:
+                return meta, body
+        return None
+
+    def record(self, key: str, meta: Dict, body: bytes) -> None:
+        short = int(key[:16], 16)
+        #Record mode always makes the request; a request already recorded keeps its first response. Checked
+        #before compressing to skip the work, and again before writing, as the same request may be in flight twice.
+        with self.lock:
+            if short in self.pending:
+                self.counters['duplicates'] += 1
+                return
+        data = zlib.compress(json.dumps(dict(meta, key=key)).encode() + b"\0" + body)
+        with self.lock:
+            if short in self.pending:
+                self.counters['duplicates'] += 1
+                return
+            offset = self.file.tell()
+            self.file.write(data)
+            self.pending[short] = (offset, len(data))
+            self.counters['recorded'] += 1
+            self.counters['bytes_written'] += len(data)
+
+    def replay(self, key: str, description: str) -> Tuple[Dict, bytes]:
+        """
+        The record for a request hash, after the configured latency.
+
+        Raises:
+            CassetteMiss: If the request was not recorded
+        """
+        found = self.lookup(key)
+        with self.lock:
+            self.counters['replayed' if found else 'missing'] += 1
+        if found is None:
+            raise CassetteMiss(f"No recording for {description}")
+        delay = found[0].get("elapsed", 0.0) * self.latency_scale + self.latency
+        if delay > 0:
+            time.sleep(delay)
+        return found
+
+    def call(self, kind: str, arguments: Dict, fn: Callable[[], Any]) -> Any:
+        """
+        Record or replay a call through an SDK client. The return value must be JSON serializable; an exception
+        is recorded as well and replayed as RecordedError.
+        """
+        key = request_hash(kind, arguments)
+        if self.mode == "replay":
+            meta, body = self.replay(key, kind)
+            if "error" in meta:
+                raise RecordedError(meta["error"])
+            return json.loads(body)
+
+        start = time.perf_counter()
+        try:
+            value = fn()
+        except Exception as e:
+            self.record(key, {"kind": kind, "error": str(e) or type(e).__name__, "elapsed": time.perf_counter() - start}, b"")
+            raise
+        self.record(key, {"kind": kind, "elapsed": time.perf_counter() - start}, json.dumps(value, default=str).encode())
+        return value
+
+    def save(self) -> None:
+        """
+        Write the index, merged with the existing one. Only needed when recording.
+        """
+        if self.mode != "record":
+            return
+        with self.lock:
+            self.file.flush()
+            entries = {int(h): (int(o), int(n)) for h, o, n in zip(self.hashes, self.offsets, self.lengths)}
+            entries.update(self.pending)
+            keys = sorted(entries)
+            hashes = np.array(keys, np.uint64)
+            offsets = np.array([entries[k][0] for k in keys], np.uint64)
+            lengths = np.array([entries[k][1] for k in keys], np.uint32)
+            temporary = self.index_path + ".tmp"
+            with open(temporary, "wb") as f:
+                f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, 1, len(keys)))
+                f.write(hashes.tobytes())
+                f.write(offsets.tobytes())
+                f.write(lengths.tobytes())
+            os.replace(temporary, self.index_path)
+
+    def close(self) -> None:
+        self.save()
+        if self.mode == "record":
+            self.file.close()
+        elif self.records is not None:
+            self.records.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters, entries=len(self.hashes) + len(self.pending))
+
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    Transport adapter that records responses to a cassette or replays them from it, instead of (or on top of)
+    sending requests over the network.
+    """
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+        key = request_hash(request.method, strip_secrets(request.url), hashlib.sha256(body).hexdigest())
+        if self.cassette.mode == "replay":
+            meta, content = self.cassette.replay(key, f"{request.method} {urlsplit(request.url).netloc}{urlsplit(request.url).path}")
+            return self._build(request, meta, content)
+
+        start = time.perf_counter()
+        response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        #Read whole, so it can be recorded; iter_content/iter_lines then serve the stored content
+        content = response.content
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS}
+        self.cassette.record(key, {"status": response.status_code, "reason": response.reason, "headers": headers,
+                                   "elapsed": time.perf_counter() - start}, content)
+        return response
+
+    def _build(self, request, meta: Dict, content: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.reason = meta.get("reason")
+        response.headers = CaseInsensitiveDict(meta.get("headers") or {})
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=meta.get("elapsed", 0.0))
+        response.connection = self
+        return response
+
+
+class _AmadeusResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _CassetteClient:
+    #Wraps the real client, which is only created if a call has to be recorded (replays need neither it nor its SDK)
+    def __init__(self, cassette: Cassette, factory: Callable):
+        self.cassette = cassette
+        self.factory = factory
+        self.client = None
+        self.lock = threading.Lock()
+
+    def real(self):
+        with self.lock:
+            if self.client is None:
+                self.client = self.factory()
+            return self.client
+
+
+class CassetteAmadeusClient(_CassetteClient):
+    #Same shape as the Amadeus client for flight offer searches (client.shopping.flight_offers_search.get)
+    def __init__(self, cassette: Cassette, factory: Callable):
+        super().__init__(cassette, factory)
+        self.shopping = self
+        self.flight_offers_search = self
+
+    def get(self, **params):
+        return _AmadeusResponse(self.cassette.call(
+            "amadeus.flight_offers_search", params, lambda: self.real().shopping.flight_offers_search.get(**params).data))
+
+
+class CassetteDDGS(_CassetteClient):
+    def text(self, query: str, max_results: Optional[int] = None, **kwargs):
+        return self.cassette.call("ddgs.text", dict(kwargs, query=query, max_results=max_results),
+                                  lambda: list(self.real().text(query, max_results=max_results, **kwargs)))
+
+
+class CassetteTranscriptApi(_CassetteClient):
+    def get_transcript(self, video_id: str, *args, **kwargs):
+        return self.cassette.call("youtube.get_transcript", dict(kwargs, video_id=video_id, args=list(args)),
+                                  lambda: self.real().get_transcript(video_id, *args, **kwargs))
+
+
+def install(cassette: Cassette) -> None:
+    """
+    Route the agent's network traffic through a cassette: the shared HTTP session, and the Amadeus, DuckDuckGo
+    and YouTube transcript clients that tools.py and flights.py get from tools.get_client.
+    """
+    import tools
+    from fetch import POOL_SIZE, get_session
+
+    adapter = CassetteAdapter(cassette, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session = get_session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    wrappers = {'amadeus': CassetteAmadeusClient, 'ddgs': CassetteDDGS, 'youtube_transcripts': CassetteTranscriptApi}
+    for name, wrapper in wrappers.items():
+        factory = tools.CLIENT_FACTORIES[name]
+        tools.CLIENT_FACTORIES[name] = lambda wrapper=wrapper, factory=factory: wrapper(cassette, factory)
+    tools.reset_clients()
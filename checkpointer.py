@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata,
+                                       CheckpointTuple, get_checkpoint_id)
+
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite"))
+#Checkpoints kept per thread; older ones are deleted along with channel values nothing else refers to
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "50"))
+#Serialized values larger than this are stored zlib-compressed
+COMPRESS_BYTES = 512
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer that keeps threads in a local SQLite file, so a run can be resumed after a crash
+    and earlier steps can be replayed.
+
+    Each checkpoint row holds only the channel versions; a channel's value is written once per new version
+    (the delta a step made), not again in every later checkpoint. Only the last keep checkpoints of a thread
+    are kept, so the file does not grow with the length of a conversation.
+
+    Args:
+        path (str): SQLite file, or None to keep everything in memory
+        keep (int): Checkpoints kept per thread and namespace
+    """
+
+    def __init__(self, path: Optional[str] = CHECKPOINT_PATH, keep: int = CHECKPOINT_KEEP):
+        super().__init__()
+        self.path = path
+        self.keep = keep
+        self.lock = threading.RLock()
+        self.db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.db is None:
+            if self.path and os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_id TEXT, versions TEXT,
+                    type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));
+                CREATE TABLE IF NOT EXISTS blobs (
+                    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT, type TEXT, value BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, channel, version));
+                CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+                    channel TEXT, type TEXT, value BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));
+            """)
+        return self.db
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) > COMPRESS_BYTES:
+            return "z:" + type_, zlib.compress(data)
+        return type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_.startswith("z:"):
+            type_, data = type_[2:], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: Sequence) -> CheckpointTuple:
+        checkpoint_id, parent_id, _, type_, data, metadata_type, metadata = row
+        db = self._connect()
+        checkpoint = self._load(type_, data)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = db.execute("SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                              (thread_id, checkpoint_ns, channel, str(version))).fetchone()
+            if blob is not None and blob[0] != "empty":
+                channel_values[channel] = self._load(*blob)
+        checkpoint["channel_values"] = channel_values
+
+        writes = db.execute("SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                            "AND checkpoint_id = ? ORDER BY task_id, idx", (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+        parent_config = None
+        if parent_id:
+            parent_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+        return CheckpointTuple(config, checkpoint, self._load(metadata_type, metadata), parent_config,
+                               [(task_id, channel, self._load(type_, value)) for task_id, channel, type_, value in writes])
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = ("SELECT checkpoint_id, parent_id, versions, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                 "WHERE thread_id = ? AND checkpoint_ns = ?")
+        with self.lock:
+            db = self._connect()
+            if checkpoint_id:
+                row = db.execute(query + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = db.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+            return self._tuple(thread_id, checkpoint_ns, row) if row is not None else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """
+        Checkpoints of a thread (or of all threads if config is None), newest first.
+        """
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, versions, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        conditions, params = [], []
+        if config is not None:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if "checkpoint_ns" in config["configurable"]:
+                conditions.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+        if before is not None:
+            conditions.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        results = []
+        with self.lock:
+            for row in self._connect().execute(query + " ORDER BY checkpoint_id DESC", params).fetchall():
+                result = self._tuple(row[0], row[1], row[2:])
+                if filter and any(result.metadata.get(key) != value for key, value in filter.items()):
+                    continue
+                results.append(result)
+                if limit is not None and len(results) >= limit:
+                    break
+        #Built before yielding, so the lock is not held while the caller works through them
+        yield from results
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values")
+        with self.lock:
+            db = self._connect()
+            #Only the channels this step changed are written; the rest are shared with earlier checkpoints
+            for channel, version in new_versions.items():
+                type_, data = self._dump(values[channel]) if channel in values else ("empty", b"")
+                db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                           (thread_id, checkpoint_ns, channel, str(version), type_, data))
+            versions = json.dumps({channel: str(version) for channel, version in checkpoint["channel_versions"].items()})
+            db.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"), versions,
+                        *self._dump(dict(checkpoint, channel_values={})), *self._dump(metadata)))
+            self._prune(thread_id, checkpoint_ns)
+            db.commit()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self.lock:
+            db = self._connect()
+            db.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           [(thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"], task_id, idx, channel, *self._dump(value))
+                            for idx, (channel, value) in enumerate(writes)])
+            db.commit()
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        db = self.db
+        old = [row[0] for row in db.execute("SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                                            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?", (thread_id, checkpoint_ns, self.keep))]
+        if not old:
+            return
+        for checkpoint_id in old:
+            db.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                       (thread_id, checkpoint_ns, checkpoint_id))
+            db.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                       (thread_id, checkpoint_ns, checkpoint_id))
+
+        #Channel values no kept checkpoint refers to any more
+        referenced = set()
+        for (versions,) in db.execute("SELECT versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)):
+            referenced.update(json.loads(versions).items())
+        stored = db.execute("SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)).fetchall()
+        db.executemany("DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                       [(thread_id, checkpoint_ns, channel, version) for channel, version in stored if (channel, version) not in referenced])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            db = self._connect()
+            for table in ("checkpoints", "blobs", "writes"):
+                db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            db.commit()
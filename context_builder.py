@@ -0,0 +1,191 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from prompts import count_tokens
+from transcripts import get_transcript_index
+
+#Upper bound on the tokens all tool outputs together may take up in the context
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+#How many transcript chunks are considered for the context
+TRANSCRIPT_TOP_K = int(os.getenv("TRANSCRIPT_TOP_K", "8"))
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'for', 'from', 'how', 'i', 'in', 'is', 'it',
+    'me', 'my', 'of', 'on', 'or', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'which', 'who', 'will',
+    'with', 'you', 'your', 'about', 'tell', 'get', 'give', 'find', 'some', 'any', 'there', 'that'
+}
+
+WEB_RESULT_PATTERN = re.compile(r"Source:\s*(.*?)\s*Summary:\s*(.*?)\s*Content:\s*(.*?)\s*-{10,}", re.S)
+
+
+def terms(text: str) -> List[str]:
+    return [term for term in re.findall(r"[a-z0-9]+", text.lower()) if term not in STOPWORDS]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", text) if sentence.strip()]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text down to at most max_tokens tokens, at a word boundary where possible.
+    """
+    if max_tokens <= 0:
+        return ""
+    tokens = count_tokens(text)
+    while tokens > max_tokens:
+        cut = int(len(text) * max_tokens / tokens * 0.95)
+        space = text.rfind(" ", 0, cut)
+        text = text[:space if space > cut // 2 else cut]
+        tokens = count_tokens(text)
+    return text
+
+
+def _shingles(words: List[str], size: int = 5) -> set:
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def compact_transcript(segments: List[Dict], question: str, max_tokens: int, video_url: Optional[str] = None) -> str:
+    """
+    With the video known, keep the transcript chunks most relevant to the question (best first until the budget
+    is used up, shown in video order). Otherwise keep the spoken text from the start, without timestamps.
+    """
+    index = get_transcript_index(video_url, segments) if video_url else None
+    if index is not None:
+        chosen = []
+        used = 0
+        for chunk in index.search(question, TRANSCRIPT_TOP_K):
+            line = f"[{int(chunk['start']) // 60}:{int(chunk['start']) % 60:02d}] {chunk['text']}"
+            cost = count_tokens(line) + 1
+            if used + cost > max_tokens:
+                continue
+            chosen.append((chunk['start'], line))
+            used += cost
+        if chosen:
+            return "\n".join(line for _, line in sorted(chosen))
+
+    text = " ".join(str(segment.get('text', '')).replace("\n", " ") for segment in segments)
+    return truncate_to_tokens(text, max_tokens)
+
+
+def compact_web_results(results: List[str], question: str, max_tokens: int) -> str:
+    """
+    Keep the sentences of the scraped pages that are most relevant to the question, without repeats, under max_tokens.
+    """
+    candidates = []
+    for index, result in enumerate(results):
+        match = WEB_RESULT_PATTERN.search(result)
+        if match:
+            title, summary, content = match.groups()
+        else:
+            title, summary, content = f"Result {index + 1}", "", result
+        for position, sentence in enumerate(split_sentences(summary) + split_sentences(content)):
+            candidates.append((index, position, title, sentence))
+
+    #Drop sentences that mostly repeat what an earlier result already said
+    seen = set()
+    unique = []
+    for candidate in candidates:
+        shingles = _shingles(re.findall(r"\w+", candidate[3].lower()))
+        if len(shingles & seen) > len(shingles) / 2:
+            continue
+        seen |= shingles
+        unique.append(candidate)
+
+    #Rank by question terms the sentence contains, weighted by how rare they are across sentences
+    sentence_terms = [set(terms(candidate[3])) for candidate in unique]
+    document_frequency = Counter(term for term_set in sentence_terms for term in term_set)
+    question_terms = set(terms(question))
+
+    def score(i):
+        matched = question_terms & sentence_terms[i]
+        relevance = sum(math.log(1 + len(unique) / document_frequency[term]) for term in matched)
+        #Earlier sentences of a page (and the search summary) win ties
+        return relevance / math.sqrt(len(sentence_terms[i]) + 1) - unique[i][1] * 1e-3
+
+    chosen = []
+    used = 0
+    for i in sorted(range(len(unique)), key=score, reverse=True):
+        cost = count_tokens(unique[i][3]) + 1
+        if used + cost > max_tokens:
+            continue
+        chosen.append(i)
+        used += cost
+
+    by_source = {}
+    for i in sorted(chosen, key=lambda i: (unique[i][0], unique[i][1])):
+        by_source.setdefault(unique[i][2], []).append(unique[i][3])
+    return "\n".join(f"Source: {title}\n{' '.join(sentences)}" for title, sentences in by_source.items())
+
+
+def compact_output(tool: str, output: Any, question: str, max_tokens: int, tool_input: Optional[Dict] = None) -> str:
+    """
+    Compact one tool's output to text of at most max_tokens tokens.
+    """
+    if output is None:
+        return "No result"
+    if tool == 'get_youtube_transcript' and isinstance(output, list):
+        return compact_transcript(output, question, max_tokens, (tool_input or {}).get('video_url'))
+    if tool == 'web_search' and isinstance(output, list):
+        return compact_web_results(output, question, max_tokens)
+    text = output if isinstance(output, str) else json.dumps(output, ensure_ascii=False, separators=(',', ':'))
+    return truncate_to_tokens(text, max_tokens)
+
+
+def build_context(question: str, tools_used: List[str], tool_outputs: List[Any], tool_inputs: Optional[List[Dict]] = None,
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, Dict[str, int]]:
+    """
+    Build the context for the answer call, fitting all tool outputs into a token budget.
+
+    Small outputs (weather, dates, flights) are kept whole when they fit; what is left of the budget is shared
+    evenly between the large ones, with each output's unused share passed on to the next.
+
+    Args:
+        question (str): The question being answered
+        tools_used (List[str]): Tool names, in the same order as tool_outputs
+        tool_outputs (List[Any]): Raw tool outputs
+        tool_inputs (List[Dict]): The inputs each tool was called with, if known
+        budget (int): Token budget for all tool outputs together
+
+    Returns:
+        Tuple[str, Dict[str, int]]: The context, and how many bytes/tokens the raw outputs took
+                                    compared to the compacted ones
+    """
+    tool_inputs = tool_inputs or [None] * len(tool_outputs)
+    raw = [output if isinstance(output, str) else json.dumps(output, ensure_ascii=False, default=str) for output in tool_outputs]
+    raw_tokens = [count_tokens(text) for text in raw]
+
+    order = sorted(range(len(tool_outputs)), key=lambda i: raw_tokens[i])
+    compacted = [""] * len(tool_outputs)
+    remaining = budget
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        compacted[i] = compact_output(tools_used[i], tool_outputs[i], question, share, tool_inputs[i])
+        remaining -= count_tokens(compacted[i])
+
+    outputs = "\n\n".join(f"[{tool}]\n{text}" for tool, text in zip(tools_used, compacted))
+    context = f"""
+
+    You are trying to answer this question: {question}
+    You used the following tools: {tools_used}
+
+    You got the following outputs from the tools:
+{outputs}
+
+    """
+
+    stats = {
+        'raw_bytes': sum(len(text.encode()) for text in raw),
+        'compacted_bytes': sum(len(text.encode()) for text in compacted),
+        'raw_tokens': sum(raw_tokens),
+        'compacted_tokens': sum(count_tokens(text) for text in compacted),
+    }
+    stats['saved_bytes'] = stats['raw_bytes'] - stats['compacted_bytes']
+    stats['saved_tokens'] = stats['raw_tokens'] - stats['compacted_tokens']
+    return context, stats
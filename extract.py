@@ -0,0 +1,165 @@
+import os
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict
+
+#Which extractor web_search uses: "fast" (stdlib tokenizer), "lxml" or "bs4"
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "fast")
+
+#Elements whose text is never visible
+INVISIBLE_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+#Elements whose text is rarely useful page content. Not <form>: ASP.NET and similar pages wrap the whole body in one.
+SKIP_TAGS = INVISIBLE_TAGS | {'head', 'nav', 'footer', 'aside', 'iframe'}
+MAIN_TAGS = {'main', 'article'}
+MAIN_PATTERN = re.compile(r"<(?:main|article)[\s>]", re.I)
+
+#How much HTML the fast extractor tokenizes at a time before checking whether it has enough text
+FEED_SIZE = 8 * 1024
+
+
+def _finish(pieces, max_chars: int) -> str:
+    text = ' '.join(pieces)
+    return text[:max_chars] + '...' if len(text) > max_chars else text
+
+
+def extract_bs4(html: str, max_chars: int = 2000) -> str:
+    """
+    Reference extractor: parse the whole page with BeautifulSoup and keep every visible string.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(['script', 'style', 'meta', 'link']):
+        script.decompose()
+    return _finish(soup.stripped_strings, max_chars)
+
+
+class _BudgetReached(Exception):
+    pass
+
+
+class _TextCollector(HTMLParser):
+    #Collects stripped text outside of skip_tags, and only inside MAIN_TAGS when main_only is set
+    def __init__(self, max_chars: int, main_only: bool, skip_tags=SKIP_TAGS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.main_only = main_only
+        self.skip_tags = skip_tags
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.pieces = []
+        self.length = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skip_tags:
+            self.skip_depth += 1
+        elif tag in MAIN_TAGS:
+            self.main_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.skip_tags and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in MAIN_TAGS and self.main_depth:
+            self.main_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth or (self.main_only and not self.main_depth):
+            return
+        data = data.strip()
+        if not data:
+            return
+        self.pieces.append(' '.join(data.split()))
+        self.length += len(self.pieces[-1]) + 1
+        #One character past the budget is enough to know the text has to be cut
+        if self.length > self.max_chars:
+            raise _BudgetReached()
+
+
+def _collect_text(html: str, max_chars: int, main_only: bool, skip_tags=SKIP_TAGS):
+    collector = _TextCollector(max_chars, main_only, skip_tags)
+    try:
+        for start in range(0, len(html), FEED_SIZE):
+            collector.feed(html[start:start + FEED_SIZE])
+        collector.close()
+    except _BudgetReached:
+        pass
+    return collector.pieces
+
+
+def extract_fast(html: str, max_chars: int = 2000) -> str:
+    """
+    Streaming extractor: tokenize the page in slices and stop as soon as max_chars of text have been collected.
+    Text inside <main>/<article> is preferred when the page has them; navigation, footers and scripts are skipped.
+    """
+    main_only = MAIN_PATTERN.search(html) is not None
+    pieces = _collect_text(html, max_chars, main_only)
+    if main_only and not pieces:
+        #The main/article match was a false positive (e.g. inside a script); fall back to the whole page
+        pieces = _collect_text(html, max_chars, False)
+    if not pieces:
+        #Everything was in skipped elements (e.g. a page that is one big <nav>); keep whatever is visible
+        pieces = _collect_text(html, max_chars, False, INVISIBLE_TAGS)
+    return _finish(pieces, max_chars)
+
+
+def extract_lxml(html: str, max_chars: int = 2000) -> str:
+    """
+    lxml extractor: parse with the C parser, then walk only <main>/<article> (or <body>) until max_chars is reached.
+    """
+    import lxml.html
+
+    root = lxml.html.fromstring(html)
+    regions = (root.xpath('//main[not(ancestor::main)]') or root.xpath('//article[not(ancestor::article)]')
+               or root.xpath('//body') or [root])
+    pieces = []
+    length = 0
+
+    def add(text):
+        nonlocal length
+        text = ' '.join((text or '').split())
+        if text:
+            pieces.append(text)
+            length += len(text) + 1
+            if length > max_chars:
+                raise _BudgetReached()
+
+    def collect(element, skip_tags):
+        #Comments and processing instructions have a non-string tag; their tail is still added by the parent
+        if not isinstance(element.tag, str) or element.tag in skip_tags:
+            return
+        add(element.text)
+        for child in element:
+            collect(child, skip_tags)
+            add(child.tail)
+
+    try:
+        for region in regions:
+            collect(region, SKIP_TAGS)
+        if not pieces:
+            #Nothing outside skipped elements; keep whatever is visible on the page
+            collect(root, INVISIBLE_TAGS)
+    except _BudgetReached:
+        pass
+    return _finish(pieces, max_chars)
+
+
+EXTRACTORS: Dict[str, Callable[[str, int], str]] = {
+    'fast': extract_fast,
+    'lxml': extract_lxml,
+    'bs4': extract_bs4,
+}
+
+
+def extract_text(html: str, max_chars: int = 2000, mode: str = None) -> str:
+    """
+    Get the readable text of a page, cut to max_chars characters ('...' is appended when it was cut).
+
+    Args:
+        html (str): Page HTML
+        max_chars (int): Maximum number of characters of text to return
+        mode (str): Extractor to use (default: EXTRACT_MODE)
+
+    Returns:
+        str: The page text
+    """
+    return EXTRACTORS[mode or EXTRACT_MODE](html, max_chars)
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0'
+]
+
+#Pages bigger than this are cut off instead of being fully downloaded
+MAX_PAGE_BYTES = 512 * 1024
+POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Get the shared keep-alive session used for outgoing HTTP requests.
+
+    Returns:
+        requests.Session: Session with a connection pool mounted for http and https
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Each acquire() takes one token, blocking until one is available.
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (float): Maximum number of tokens that can be saved up (burst size)
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """
+    Keeps one token bucket per host so requests to different sites are not slowed down by each other.
+
+    Args:
+        rate (float): Requests per second allowed for each host
+        burst (float): Number of requests a host can receive back to back
+    """
+
+    def __init__(self, rate: float = 1.0, burst: float = 2):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str) -> None:
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+host_limiter = HostRateLimiter()
+
+
+def fetch_page(url: str, session: Optional[requests.Session] = None, limiter: Optional[HostRateLimiter] = None,
+               max_bytes: int = MAX_PAGE_BYTES, timeout: float = 10) -> str:
+    """
+    Download a page as text, reading at most max_bytes of the body.
+
+    Args:
+        url (str): Page to download
+        session (requests.Session): Session to use (default: the shared session)
+        limiter (HostRateLimiter): Per-host rate limiter (default: the shared limiter)
+        max_bytes (int): Stop reading the body after this many bytes
+        timeout (float): Connect/read timeout in seconds
+
+    Returns:
+        str: The (possibly truncated) page text
+
+    Raises:
+        requests.RequestException: If the request fails or returns an error status
+    """
+    session = session or get_session()
+    limiter = limiter or host_limiter
+    limiter.acquire(url)
+
+    headers = {
+        'User-Agent': random.choice(USER_AGENTS),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+    }
+
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                break
+        body = b''.join(chunks)[:max_bytes]
+        return body.decode(response.encoding or 'utf-8', errors='replace')
+
+
+def fetch_pages(urls: List[str], max_workers: int = 5, **kwargs) -> List[Optional[str]]:
+    """
+    Download several pages concurrently over the shared connection pool.
+
+    Args:
+        urls (List[str]): Pages to download
+        max_workers (int): Maximum number of downloads in flight
+        **kwargs: Passed through to fetch_page
+
+    Returns:
+        List[Optional[str]]: Page text for each url in input order, or None where the download failed
+    """
+    def fetch(url):
+        try:
+            return fetch_page(url, **kwargs)
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            return None
+
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return list(executor.map(fetch, urls))
@@ -0,0 +1,224 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import product
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cache import TOOL_TTLS, ToolCache, make_key, tool_cache
+from fetch import TokenBucket
+from tools import AIRLINE_NAMES, amadeus_bucket, get_client
+
+#Upper bounds so a single question cannot fan out into hundreds of queries
+MAX_DAYS = 14
+MAX_LEGS = 40
+
+
+def parse_duration(duration: str) -> int:
+    """
+    Convert an ISO 8601 duration such as 'PT7H35M' (or 'P1DT2H') to minutes.
+    """
+    match = re.match(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?", duration or "")
+    if not match:
+        return 0
+    days, hours, minutes = (int(group or 0) for group in match.groups())
+    return days * 24 * 60 + hours * 60 + minutes
+
+
+def parse_offer(offer: Dict, origin: str, destination: str) -> Dict:
+    itinerary = offer['itineraries'][0]
+    airline_code = offer['validatingAirlineCodes'][0]
+    return {
+        'origin': origin,
+        'destination': destination,
+        'airline': AIRLINE_NAMES.get(airline_code, airline_code),
+        'departure': itinerary['segments'][0]['departure']['at'],
+        'arrival': itinerary['segments'][-1]['arrival']['at'],
+        'stops': len(itinerary['segments']) - 1,
+        'duration': parse_duration(itinerary.get('duration')),
+        'price': float(offer['price']['total']),
+        'seats': int(offer.get('numberOfBookableSeats', 0)),
+    }
+
+
+class FlightTable:
+    """
+    Flight offers stored column by column, with NumPy arrays for the columns used for ranking.
+    """
+
+    TEXT_COLUMNS = ('origin', 'destination', 'airline', 'departure', 'arrival')
+
+    def __init__(self, rows: List[Dict]):
+        self.text = {column: [row[column] for row in rows] for column in self.TEXT_COLUMNS}
+        self.price = np.array([row['price'] for row in rows], dtype=np.float64)
+        self.duration = np.array([row['duration'] for row in rows], dtype=np.int32)
+        self.stops = np.array([row['stops'] for row in rows], dtype=np.int8)
+        self.seats = np.array([row['seats'] for row in rows], dtype=np.int16)
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def ranked(self) -> np.ndarray:
+        #Cheapest first, then shortest, then most seats left (lexsort sorts by the last key first)
+        return np.lexsort((-self.seats, self.duration, self.price))
+
+    def records(self, limit: Optional[int] = None) -> List[Dict]:
+        records = []
+        for i in self.ranked()[:limit]:
+            departure = datetime.fromisoformat(self.text['departure'][i].replace('Z', '+00:00'))
+            arrival = datetime.fromisoformat(self.text['arrival'][i].replace('Z', '+00:00'))
+            records.append({
+                'origin': self.text['origin'][i],
+                'destination': self.text['destination'][i],
+                'airline': self.text['airline'][i],
+                'departure': departure.strftime('%m/%d/%y %I:%M %p'),
+                'arrival': arrival.strftime('%m/%d/%y %I:%M %p'),
+                'duration': f"{self.duration[i] // 60}h{self.duration[i] % 60:02d}m",
+                'stops': int(self.stops[i]),
+                'price': f"${self.price[i]:.2f}",
+                'seats_remaining': int(self.seats[i]),
+            })
+        return records
+
+
+class FlightSearch:
+    """
+    Runs Amadeus flight offer queries for every origin/destination/date combination concurrently,
+    within a requests-per-second budget, and caches each leg's offers. A leg that fails is left out.
+
+    Args:
+        client: Amadeus client (default: the client from tools.py); anything with
+                shopping.flight_offers_search.get(...) works, e.g. ReplayAmadeusClient
+        rate (float): Maximum Amadeus requests per second for this search alone (default: share the process-wide
+                      tools.amadeus_bucket, AMADEUS_RATE requests per second across all sessions)
+        max_workers (int): Maximum number of queries in flight
+        cache (ToolCache): Cache for per-leg results (default: the shared tool_cache)
+        max_per_leg (int): Offers requested per leg
+    """
+
+    def __init__(self, client=None, rate: Optional[float] = None, max_workers: int = 4, cache: Optional[ToolCache] = None,
+                 max_per_leg: int = 5):
+        self.client = client or get_client('amadeus')
+        self.bucket = amadeus_bucket if rate is None else TokenBucket(rate, capacity=max(1, rate))
+        self.max_workers = max_workers
+        self.cache = cache or tool_cache
+        self.max_per_leg = max_per_leg
+
+    def _fetch_leg(self, origin: str, destination: str, date: str) -> List[Dict]:
+        self.bucket.acquire()
+        response = self.client.shopping.flight_offers_search.get(
+            originLocationCode=origin,
+            destinationLocationCode=destination,
+            departureDate=date,
+            adults=1,
+            max=self.max_per_leg,
+            currencyCode='USD'
+        )
+        offers = []
+        for offer in response.data or []:
+            try:
+                offers.append(parse_offer(offer, origin, destination))
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                #One malformed offer (missing fields, an empty itinerary) does not cost the leg its other offers
+                print(f"Skipping a flight offer {origin}-{destination} on {date}: {type(e).__name__}: {str(e)}")
+        return offers
+
+    def leg(self, origin: str, destination: str, date: str) -> List[Dict]:
+        """
+        Offers for one origin/destination/date (date as YYYY-MM-DD), from the cache when possible.
+        """
+        key = make_key('flight_leg', {'origin': origin, 'destination': destination, 'date': date, 'max': self.max_per_leg})
+        try:
+            return self.cache.get_or_call(key, 'flight_leg', TOOL_TTLS['check_flights'],
+                                          lambda: self._fetch_leg(origin, destination, date))
+        except Exception as e:
+            #An API or network error: the other legs still count
+            print(f"Error checking flights {origin}-{destination} on {date}: {str(e)}")
+            return []
+
+    def search(self, origins: List[str], destinations: List[str], dates: List[str]) -> FlightTable:
+        legs = [(o, d, day) for o, d, day in product(origins, destinations, dates) if o != d][:MAX_LEGS]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda leg: self.leg(*leg), legs)
+            rows = [row for leg_rows in results for row in leg_rows]
+        return FlightTable(rows)
+
+
+def date_range(start_date: str, end_date: Optional[str] = None) -> List[str]:
+    #mm/dd/yy in, YYYY-MM-DD out, at most MAX_DAYS days
+    start = datetime.strptime(start_date, '%m/%d/%y')
+    end = datetime.strptime(end_date, '%m/%d/%y') if end_date else start
+    days = min((end - start).days, MAX_DAYS - 1)
+    return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(max(days, 0) + 1)]
+
+
+def search_flights(destinations: List[str], start_date: str, end_date: Optional[str] = None,
+                   origins: Optional[List[str]] = None, limit: int = 10) -> Optional[List[Dict]]:
+    """
+    Find the best flights over a range of dates and several origins/destinations.
+
+    Args:
+        destinations (List[str]): IATA codes of destination airports (e.g., ['NYC', 'BOS'])
+        start_date (str): First departure date in format mm/dd/yy
+        end_date (str): Last departure date in format mm/dd/yy (default: same as start_date, at most 14 days later)
+        origins (List[str]): IATA codes of origin airports (default: ['LON'])
+        limit (int): Number of flights to return (default: 10)
+
+    Returns:
+        Optional[List[Dict]]: Flights ordered by price, then duration, then seats remaining, or None if no flights are found
+    """
+    try:
+        table = FlightSearch().search(origins or ['LON'], destinations, date_range(start_date, end_date))
+        return table.records(limit) if len(table) else None
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        return None
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class ReplayAmadeusClient:
+    """
+    Stand-in for the Amadeus client that answers flight offer searches from recorded responses.
+
+    Recordings map "ORIGIN-DESTINATION-YYYY-MM-DD" to the list of offers (the "data" of the real response).
+    Unknown legs return no offers.
+
+    Args:
+        recordings (Dict or str): The recordings, or the path of a JSON file containing them
+    """
+
+    def __init__(self, recordings):
+        if isinstance(recordings, str):
+            with open(recordings) as f:
+                recordings = json.load(f)
+        self.recordings = recordings
+        self.calls = []
+        self.shopping = self
+        self.flight_offers_search = self
+
+    def get(self, originLocationCode, destinationLocationCode, departureDate, **params):
+        key = f"{originLocationCode}-{destinationLocationCode}-{departureDate}"
+        self.calls.append(key)
+        return _Response(self.recordings.get(key, []))
+
+
+def record_amadeus_responses(client, legs: List[tuple], path: str, max_per_leg: int = 5) -> None:
+    """
+    Query the real API for each (origin, destination, YYYY-MM-DD) leg and save the offers in the format
+    ReplayAmadeusClient reads.
+    """
+    recordings = {}
+    for origin, destination, date in legs:
+        response = client.shopping.flight_offers_search.get(
+            originLocationCode=origin, destinationLocationCode=destination, departureDate=date,
+            adults=1, max=max_per_leg, currencyCode='USD'
+        )
+        recordings[f"{origin}-{destination}-{date}"] = response.data or []
+    with open(path, 'w') as f:
+        json.dump(recordings, f)
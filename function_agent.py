@@ -0,0 +1,147 @@
+"""
+Alternative engine for prompt_agent.py that uses the chat API's native tool calling.
+
+Instead of describing the tools in the system prompt and parsing a custom JSON reply, the tool schemas from
+prompt_agent.tool_registry are sent as the request's "tools", and the model returns typed arguments for one or
+more tool calls at once. Tool results go back as "tool" messages and the model answers in plain text.
+"""
+import contextvars
+import json
+import os
+import time
+
+import prompt_agent
+from context_builder import CONTEXT_TOKEN_BUDGET, compact_output
+from prompts import build_user_message, report_prompt_tokens
+from tracing import span
+
+FUNCTION_SYSTEM_PROMPT = """You are an agent that will assist the user in the task requested. You can use the provided tools to help you complete this task.
+Only use the tools if you don't have the information you need, and request every tool you need at once.
+When you have the information you need, answer in natural language. Be detailed and thorough; summarize if there is a lot of information."""
+
+#Rounds of tool calls allowed per question; the request after the last one offers no tools, so the model has to answer
+MAX_TOOL_ROUNDS = int(os.getenv("FUNCTION_MAX_ROUNDS", "2"))
+
+
+def build_function_payload(messages, with_tools=True):
+    payload = {
+        "model": "gpt-4o-mini",
+        "messages": messages,
+        "max_tokens": 1000,
+    }
+    if with_tools:
+        payload.update(tools=prompt_agent.tool_registry.definitions(), parallel_tool_calls=True)
+    return payload
+
+
+def run_tool_calls(tool_calls, question):
+    """
+    Run the tool calls from one assistant message concurrently on the shared tool pool.
+
+    Returns:
+        tuple[list, list, list, list]: (tools_used, tool_inputs, tool_outputs, tool messages to send back),
+                                       in the order the model made the calls
+    """
+    started = []
+    batch = prompt_agent.ToolBatch(deadline=time.monotonic() + prompt_agent.TOOL_TIMEOUT)
+    for call in tool_calls:
+        name = call["function"]["name"]
+        try:
+            arguments = json.loads(call["function"].get("arguments") or "{}")
+        except ValueError as e:
+            started.append((call, name, None, f"Invalid arguments: {str(e)}"))
+            continue
+        if name not in prompt_agent.tool_registry:
+            started.append((call, name, arguments, "Tool not found"))
+            continue
+        #Run in a copy of this context, so the tool's span is part of the current turn
+        future = prompt_agent.tool_pool.submit(contextvars.copy_context().run, prompt_agent.run_tool, name, arguments)
+        started.append((call, name, arguments, future))
+        batch.append((name, future))
+    done = prompt_agent.wait_tools(batch)
+
+    tools_used, tool_inputs, tool_outputs, messages = [], [], [], []
+    #Each result gets an even share of the context budget, compacted the same way as in the prompt engine
+    share = CONTEXT_TOKEN_BUDGET // max(1, len(started))
+    for call, name, arguments, future in started:
+        if isinstance(future, str):
+            content = future
+            output = None
+        elif future not in done:
+            print(f"Tool {name} timed out")
+            content = "Tool timed out"
+            output = None
+        else:
+            try:
+                output = future.result()
+            except Exception as e:
+                print(f"Error running {name}: {str(e)}")
+                output = None
+            content = compact_output(name, output, question, share, arguments)
+        tools_used.append(name)
+        tool_inputs.append(arguments)
+        tool_outputs.append(output)
+        messages.append({"role": "tool", "tool_call_id": call["id"], "content": content})
+    return tools_used, tool_inputs, tool_outputs, messages
+
+
+def run_turn(question, context="", on_text=None, verbose=False):
+    """
+    Answer one question with native tool calling. Takes and returns the same as prompt_agent.run_turn,
+    so either engine can be passed to the server.
+
+    on_text is called once with the whole answer; this engine does not stream.
+    """
+    with span("turn", engine="functions"):
+        return _run_turn(question, context, on_text, verbose)
+
+
+def _run_turn(question, context, on_text, verbose):
+    messages = [
+        {"role": "system", "content": FUNCTION_SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_message(question, context)},
+    ]
+    turn = {"question": question, "tools_used": [], "tool_inputs": [], "tool_outputs": [], "context_stats": None}
+
+    for round in range(MAX_TOOL_ROUNDS + 1):
+        payload = build_function_payload(messages, with_tools=round < MAX_TOOL_ROUNDS)
+        with span("get_llm_response", engine="functions") as llm_span:
+            response_data = prompt_agent.llm_client.chat(payload)
+            usage = response_data.get("usage") or {}
+            llm_span.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+        report_prompt_tokens("function_call", messages, response_data.get("usage"))
+
+        if not response_data.get("choices"):
+            turn["response"] = {"error": "No valid response from model"}
+            return turn
+        message = response_data["choices"][0]["message"]
+        tool_calls = message.get("tool_calls")
+        if not tool_calls:
+            turn["response"] = {"response": message.get("content") or ""}
+            if on_text:
+                on_text(turn["response"]["response"])
+            return turn
+
+        if verbose:
+            print({call["function"]["name"]: call["function"].get("arguments") for call in tool_calls})
+        tools_used, tool_inputs, tool_outputs, tool_messages = run_tool_calls(tool_calls, question)
+        if verbose:
+            print(tool_outputs)
+        messages.append({"role": "assistant", "content": message.get("content"), "tool_calls": tool_calls})
+        messages.extend(tool_messages)
+        turn["tools_used"] += tools_used
+        turn["tool_inputs"] += tool_inputs
+        turn["tool_outputs"] += tool_outputs
+
+    turn["response"] = {"error": "No answer after the last round of tool calls"}
+    return turn
+
+
+if __name__ == "__main__":
+    while True:
+        try:
+            question = input("Enter a question: ")
+        except (EOFError, KeyboardInterrupt):
+            break
+        turn = run_turn(question, verbose=True)
+        print(turn["response"].get("response", turn["response"]))
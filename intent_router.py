@@ -0,0 +1,241 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+#Predictions at least this confident replace the planning call; less confident ones only start the tools early
+SKIP_CONFIDENCE = float(os.getenv("ROUTER_SKIP_CONFIDENCE", "0.9"))
+MEMORY_SIZE = 1000
+MEMORY_PATH = os.getenv("ROUTER_MEMORY_PATH", os.path.join(".cache", "intent_memory.json"))
+#Learned plans are forgotten after this many seconds (default a week)
+MEMORY_TTL = float(os.getenv("ROUTER_MEMORY_TTL", str(7 * 24 * 60 * 60)))
+#Pattern matches: the whole question matched, or only part of it (those only start their tools early)
+PATTERN_CONFIDENCE = 0.92
+PARTIAL_CONFIDENCE = 0.6
+
+#A place name: letters in any script (not digits or underscores), spaces and . ' -
+_PLACE = r"(?:[^\W\d_]|[ .'-])"
+DATE_PATTERN = re.compile(r"\b(what(?:'s| is) (?:the |today'?s )?date|what day is (?:it|today)|today'?s date)\b", re.I)
+WEATHER_PATTERN = re.compile(r"\b(?:weather|temperature|forecast)\b(?: like)?(?: today| now| right now)? (?:in|for|at) (" + _PLACE + r"+?)"
+                             r"(?:\?|\.|!|,| today| tonight| tomorrow| now| right now| this| next| on| over| during|(?!" + _PLACE + r")|$)", re.I)
+YOUTUBE_PATTERN = re.compile(r"(https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[\w-]+)")
+
+#Questions that are about one of those things and nothing else; only these skip the planning call
+_END = r"\s*[?.!]*\s*$"
+FULL_PATTERNS = {
+    'get_todays_date': re.compile(r"^\s*(?:what(?:'s| is) (?:the |today'?s )?date(?: today)?|what day is (?:it|today)|today'?s date)" + _END, re.I),
+    'get_current_weather': re.compile(r"^\s*(?:what(?:'s| is) the |how(?:'s| is) the )?(?:weather|temperature|forecast)(?: like)?"
+                                      r"(?: today| now| right now)? (?:in|for|at) (?P<location>" + _PLACE + r"+?)(?: today| now| right now)?" + _END, re.I),
+    'get_youtube_transcript': re.compile(r"^\s*(?:(?:summari[sz]e|transcribe|get the transcript (?:of|for)|what does)\s+)?"
+                                         r"https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[\w-]+(?:\s+say)?" + _END, re.I),
+}
+#Words that make a captured "location" something other than a city
+NOT_A_PLACE = re.compile(r"\b(my|our|your|his|her|their|this|next|trip|today|tonight|tomorrow|yesterday|week|weekend|month|now|"
+                         r"what|how|does|is|say|tell)\b", re.I)
+
+#Questions and plan inputs that depend on when they are asked; their plans are not learned
+RELATIVE_TIME = re.compile(r"\b(today|tonight|tomorrow|yesterday|now|current(?:ly)?|latest|this (?:week|weekend|month|year)|"
+                           r"next (?:week|weekend|month|year|\w+day)|last (?:week|weekend|month|year|\w+day)|in \d+ days?)\b", re.I)
+DATE_VALUE = re.compile(r"\b\d{1,2}/\d{1,2}/\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b")
+
+class RoutePrediction:
+    def __init__(self, plan: Dict, confidence: float, source: str):
+        self.plan = plan
+        self.confidence = confidence
+        self.source = source
+
+    def __repr__(self):
+        return f"RoutePrediction({self.plan}, confidence={self.confidence:.2f}, source={self.source!r})"
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.findall(r"[\w']+|https?://\S+", question.lower()))
+
+
+def normalize_plan(plan: Dict) -> str:
+    #Plans that only differ in letter case or spacing of their inputs are the same plan
+    def normalize(value):
+        if isinstance(value, str):
+            return value.strip().casefold()
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [normalize(item) for item in value]
+        return value
+    return json.dumps(normalize(plan or {}), sort_keys=True)
+
+
+def time_sensitive(question: str, plan: Dict) -> bool:
+    """
+    Whether a plan depends on when the question was asked: it uses today's date, has a date among its inputs,
+    or answers a question with a relative time ("tomorrow", "next week", ...).
+    """
+    if 'get_todays_date' in (plan or {}) or RELATIVE_TIME.search(question):
+        return True
+    return bool(DATE_VALUE.search(json.dumps(plan or {})))
+
+
+def whole_question(question: str, plan: Dict) -> bool:
+    #Whether the question is only about the one thing the plan does
+    if len(plan) != 1:
+        return False
+    tool, = plan
+    match = FULL_PATTERNS[tool].match(question) if tool in FULL_PATTERNS else None
+    if match is None:
+        return False
+    if tool == 'get_current_weather':
+        location = match.group('location').strip()
+        return len(location.split()) <= 3 and not NOT_A_PLACE.search(location) \
+            and location.casefold() == plan[tool]['location'].casefold()
+    return True
+
+
+def pattern_plan(question: str) -> Optional[RoutePrediction]:
+    """
+    Predict a tool plan from fixed patterns. The prediction is only confident enough to skip the planning call
+    if the whole question matches; otherwise the question may need tools the patterns cannot predict.
+    """
+    plan = {}
+    if DATE_PATTERN.search(question):
+        plan['get_todays_date'] = {}
+    weather = [match.strip() for match in WEATHER_PATTERN.findall(question)]
+    #City names are at most a few words; anything longer, or like "my trip", is the rest of the sentence
+    weather = [city for part in weather for city in re.split(r"\s+and\s+|\s*,\s*", part)
+               if 0 < len(city.split()) <= 3 and not NOT_A_PLACE.search(city)]
+    if len(weather) == 1:
+        plan['get_current_weather'] = {'location': weather[0]}
+    elif weather:
+        plan['get_current_weather_many'] = {'locations': weather}
+    video = YOUTUBE_PATTERN.search(question)
+    if video:
+        plan['get_youtube_transcript'] = {'video_url': video.group(1)}
+    if not plan:
+        return None
+
+    return RoutePrediction(plan, PATTERN_CONFIDENCE if whole_question(question, plan) else PARTIAL_CONFIDENCE, 'pattern')
+
+
+class IntentRouter:
+    """
+    Predicts the tool plan for a question without asking the LLM, from earlier question -> plan pairs
+    (exact matches of the normalized question) and from fixed patterns. Plans that depend on the date are not
+    learned, and learned plans expire after MEMORY_TTL seconds.
+
+    Args:
+        path (str): JSON file the learned pairs are kept in, or None to keep them in memory only
+        size (int): Maximum number of question -> plan pairs kept
+        ttl (float): Seconds a learned plan is kept
+    """
+
+    def __init__(self, path: Optional[str] = MEMORY_PATH, size: int = MEMORY_SIZE, ttl: float = MEMORY_TTL):
+        self.path = path
+        self.size = size
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.counters = {'questions': 0, 'predictions': 0, 'hits': 0, 'misses': 0, 'skipped_planning': 0}
+        self.latency_saved = 0.0
+        self.planning_latency = None
+        self.unsaved = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.memory.update(json.load(f))
+            except Exception as e:
+                print(f"Error loading intent memory: {str(e)}")
+
+    def predict(self, question: str) -> Optional[RoutePrediction]:
+        key = normalize_question(question)
+        with self.lock:
+            self.counters['questions'] += 1
+            entry = self.memory.get(key)
+            #Entries from before learned_at was recorded count as expired
+            if entry is not None and entry.get('learned_at', 0) + self.ttl <= time.time():
+                del self.memory[key]
+                entry = None
+        if entry is not None:
+            #The same question got the same plan every time it was seen; more sightings, more confidence
+            confidence = min(0.99, 0.5 + 0.2 * entry['count'])
+            if time_sensitive(question, entry['plan']):
+                confidence = min(confidence, PARTIAL_CONFIDENCE)
+            prediction = RoutePrediction(entry['plan'], confidence, 'memory')
+        else:
+            prediction = pattern_plan(question)
+        if prediction is not None:
+            with self.lock:
+                self.counters['predictions'] += 1
+        return prediction
+
+    def learn(self, question: str, plan: Dict) -> None:
+        """
+        Remember the plan the LLM made for a question, unless it depends on when the question was asked.
+        """
+        key = normalize_question(question)
+        if time_sensitive(question, plan):
+            with self.lock:
+                self.memory.pop(key, None)
+            return
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and normalize_plan(entry['plan']) == normalize_plan(plan):
+                entry['count'] += 1
+                entry['learned_at'] = time.time()
+            else:
+                self.memory[key] = {'plan': plan, 'count': 1, 'learned_at': time.time()}
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.size:
+                self.memory.popitem(last=False)
+            self.unsaved += 1
+            save = self.unsaved >= 20
+        if save:
+            self.save()
+
+    def observe_planning(self, latency: float) -> None:
+        #Moving average of the planning call, used as the time saved when it is skipped
+        with self.lock:
+            if self.planning_latency is None:
+                self.planning_latency = latency
+            else:
+                self.planning_latency = 0.9 * self.planning_latency + 0.1 * latency
+
+    def record(self, prediction: Optional[RoutePrediction], plan: Optional[Dict], skipped: bool = False,
+               saved: float = 0.0) -> None:
+        """
+        Count whether a prediction matched the plan the LLM made, and how much time it saved.
+        """
+        with self.lock:
+            if skipped:
+                self.counters['skipped_planning'] += 1
+            elif prediction is not None:
+                hit = normalize_plan(prediction.plan) == normalize_plan(plan)
+                self.counters['hits' if hit else 'misses'] += 1
+            self.latency_saved += saved
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        #learn() saves from worker threads: one save at a time, and readers never see a half-written file
+        with self.save_lock:
+            with self.lock:
+                data = json.dumps(self.memory)
+                self.unsaved = 0
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temporary = self.path + ".tmp"
+            with open(temporary, "w") as f:
+                f.write(data)
+            os.replace(temporary, self.path)
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            Dict: Prediction counters, hit rate of checked predictions and total latency saved in seconds
+        """
+        with self.lock:
+            stats = dict(self.counters, latency_saved=round(self.latency_saved, 3))
+        checked = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / checked if checked else None
+        return stats
@@ -0,0 +1,128 @@
+import ast
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+
+class ToolPlan(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    tools: Dict[str, Dict[str, Any]]
+
+    @field_validator('tools', mode='before')
+    @classmethod
+    def inputs_default_to_empty(cls, tools):
+        #Tools without inputs (get_todays_date) sometimes come back as "" or null instead of {}
+        if isinstance(tools, dict):
+            return {name: tool_input or {} for name, tool_input in tools.items()}
+        return tools
+
+
+class FinalAnswer(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    response: str
+
+
+class JsonObjectScanner:
+    """
+    Finds the first balanced {...} object in text that arrives in pieces, ignoring anything around it
+    (code fences, explanations) and braces inside strings.
+
+    feed() returns the object's text as soon as its closing brace arrives, and None until then.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.quote = None
+        self.done = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.done:
+            return None
+        start = 0 if self.depth > 0 else None
+        for i, char in enumerate(chunk):
+            if self.depth == 0 and start is None:
+                if char != '{':
+                    continue
+                start = i
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == self.quote:
+                    self.in_string = False
+            elif char in '"\'':
+                #Single quotes as well, for Python-style dicts
+                self.in_string = True
+                self.quote = char
+            elif char == '{':
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.parts.append(chunk[start:i + 1])
+                    self.done = True
+                    return ''.join(self.parts)
+        if start is not None:
+            self.parts.append(chunk[start:])
+        return None
+
+
+def find_json_object(text: str) -> Optional[str]:
+    """
+    Return the text of the first balanced {...} object in text, or None if there is none.
+    """
+    return JsonObjectScanner().feed(text)
+
+
+def decode_object(text: str) -> Dict:
+    """
+    Decode an object as JSON, falling back to a Python literal (single quotes, True/None).
+
+    Raises:
+        ValueError: If it is neither
+    """
+    try:
+        return json.loads(text)
+    except RecursionError:
+        raise ValueError("invalid JSON: nested too deeply")
+    except json.JSONDecodeError as e:
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError, TypeError, RecursionError, MemoryError):
+            #Not a literal, or one that cannot be built (unhashable keys, too deeply nested)
+            raise ValueError(f"invalid JSON: {e.msg} at position {e.pos}")
+        if not isinstance(value, dict):
+            raise ValueError("expected a JSON object")
+        return value
+
+
+def parse_llm_output(text: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Extract and validate the tool plan or final answer in an LLM reply.
+
+    Returns:
+        Tuple[Optional[Dict], Optional[str]]: (the validated object, None), or (None, what was wrong with it)
+    """
+    found = find_json_object(text)
+    if found is None:
+        if '{' in text:
+            return None, "the JSON object is not complete (it has unclosed braces or strings)"
+        return None, "the reply did not contain a JSON object"
+    try:
+        value = decode_object(found)
+    except ValueError as e:
+        return None, str(e)
+
+    model = ToolPlan if 'tools' in value else FinalAnswer
+    try:
+        return model.model_validate(value).model_dump(), None
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'object'}: {error['msg']}" for error in e.errors())
+        return None, f"the object does not match the expected format ({problems})"
@@ -1,25 +1,61 @@
 import os
 import random
+import threading
 from typing import TypedDict, List, Union, Annotated
 from langchain_core.messages import BaseMessage
 from langchain_core.agents import AgentAction, AgentFinish
-from langchain.tools import Tool, tool, BaseTool, StructuredTool
-from langchain import hub
-from langchain.agents import create_openai_functions_agent
-from langchain_openai.chat_models import ChatOpenAI
-from langchain_core.agents import AgentFinish
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import tool
 from langgraph.prebuilt.tool_executor import ToolExecutor
 from langgraph.graph import END, StateGraph
-import operator
 from datetime import datetime
-
-
-
-
-OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
-
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
+from checkpointer import SqliteCheckpointSaver
+
+
+#Tracing to LangSmith stays on by default; set LANGCHAIN_TRACING_V2=false to run without it (e.g. offline)
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
+os.environ.setdefault("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
+
+#Parallel tool actions run at most this many at a time
+MAX_TOOL_CONCURRENCY = int(os.getenv("MAX_TOOL_CONCURRENCY", "4"))
+
+#Steps kept as they are in the state; older ones are folded into a single summary step
+STEP_WINDOW = int(os.getenv("STEP_WINDOW", "8"))
+SUMMARY_TOOL = "earlier_steps"
+#Update for intermediate_steps that clears them, written when a thread gets a new question
+RESET_STEPS = "reset"
+
+
+def window_steps(existing: list, new: list) -> list:
+    """
+    Reducer for intermediate_steps: appends the new steps like operator.add, but keeps at most STEP_WINDOW steps.
+    The oldest ones (and any earlier summary) are replaced by one step whose observation summarizes them, so
+    the state, its checkpoints and the agent prompt stay the same size however long a thread runs.
+    RESET_STEPS as the update clears them.
+    """
+    if new == RESET_STEPS:
+        return []
+    steps = (existing or []) + (new or [])
+    if len(steps) <= STEP_WINDOW:
+        return steps
+    cut = len(steps) - STEP_WINDOW + 1
+    #Parallel actions from one model message share its message_log and must stay together, or the message's
+    #tool calls would be sent without all of their results
+    while cut > 0 and getattr(steps[cut][0], "message_log", None) and \
+            getattr(steps[cut][0], "message_log", None) == getattr(steps[cut - 1][0], "message_log", None):
+        cut -= 1
+    if cut == 0:
+        return steps
+    old, recent = steps[:cut], steps[cut:]
+    lines = []
+    for action, observation in old:
+        if action.tool == SUMMARY_TOOL:
+            lines.append(str(observation))
+        else:
+            lines.append(f"{action.tool}({action.tool_input!r}) -> {str(observation)[:200]}")
+    #Only the most recent part of the summary is kept once it gets long
+    summary = "\n".join(lines)[-2000:]
+    return [(AgentAction(SUMMARY_TOOL, "", f"Summary of earlier steps:\n{summary}"), summary)] + recent
 
 # Setting the agent state -- from LangGraph GitHub
 class AgentState(TypedDict):
@@ -27,11 +63,12 @@ class AgentState(TypedDict):
     input: str
     #List of previous messages
     chat_history: list[BaseMessage]
-    #Outcome of a given call to the agent, needs "None" to start 
-    agent_outcome: Union[AgentAction, AgentFinish, None]
+    #Outcome of a given call to the agent: one or more actions to run, or the final answer. Needs "None" to start 
+    agent_outcome: Union[AgentAction, List[AgentAction], AgentFinish, None]
     #List of actions and corresponding observations
-    #Annotated using operator.add to show that operations/edits to this state should be added to the existing values rather than overwriting them
-    intermediate_steps: Annotated[list[tuple[AgentAction, str]], operator.add]
+    #Annotated with window_steps so that new steps are added to the existing ones rather than overwriting them,
+    #with the oldest folded into a summary
+    intermediate_steps: Annotated[list[tuple[AgentAction, str]], window_steps]
 
 
 #Making custom tools used in tutorial
@@ -61,38 +98,62 @@ tools = [lower_case, random_number, get_todays_date, get_web_info]
 #print(random_number.run('random'))
 
 
-prompt = hub.pull("hwchase17/openai-functions-agent")
-llm = ChatOpenAI(model="gpt-4o-mini", streaming=True)
+#Local copy of the hwchase17/openai-functions-agent prompt from the LangChain hub, so startup needs no network
+prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful assistant"),
+    MessagesPlaceholder("chat_history", optional=True),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
 
-agent_runnable = create_openai_functions_agent(llm, tools, prompt)
+#Chat model used by the agent. Created on first use (so importing this module needs no API key); assign
+#any chat model here before the first run to use it instead.
+llm = None
+agent_runnable = None
+_agent_lock = threading.Lock()
 
 
-inputs = {"input": "give me a random number and then write it in words and then make it lower case.",
-          "chat_history": [],
-          "intermediate_steps": []}
+def get_agent_runnable():
+    global llm, agent_runnable
+    with _agent_lock:
+        if agent_runnable is None:
+            #Imported here because langchain.agents and the OpenAI client take a while to import
+            from langchain.agents import create_openai_tools_agent
+            if llm is None:
+                from langchain_openai.chat_models import ChatOpenAI
+                llm = ChatOpenAI(model="gpt-4o-mini", streaming=True)
+            #The tools agent can ask for several tools in one step, which the action node runs concurrently
+            agent_runnable = create_openai_tools_agent(llm, tools, prompt)
+        return agent_runnable
 
-agent_outcome = agent_runnable.invoke(inputs)
-print(agent_outcome)
 
 tool_executor = ToolExecutor(tools)
 
 
+def new_question(data):
+    #A new input on a thread starts from no steps; earlier questions' tool calls stay out of its scratchpad
+    return {"intermediate_steps": RESET_STEPS, "agent_outcome": None}
+
+
 def run_agent(data):
-    agent_outcome = agent_runnable.invoke(data)
+    agent_outcome = get_agent_runnable().invoke(data)
     return {"agent_outcome": agent_outcome}
 
 
 def execute_tools(data):
     #Function gets the agent outcome as an input
 
-    #the agent outcome becomes the agent action and is a key added in the agent above
-    agent_action = data["agent_outcome"]
-    output = tool_executor.invoke(agent_action)
-    print(f"Agent action: {agent_action}")
-    print(f"Tool result: {output}")
+    #the agent outcome becomes the agent actions (one, or several to run in parallel) and is a key added in the agent above
+    agent_actions = data["agent_outcome"]
+    if not isinstance(agent_actions, list):
+        agent_actions = [agent_actions]
+    outputs = tool_executor.batch(agent_actions, config={"max_concurrency": MAX_TOOL_CONCURRENCY})
+    for agent_action, output in zip(agent_actions, outputs):
+        print(f"Agent action: {agent_action}")
+        print(f"Tool result: {output}")
 
-    #The output is added to the intermediate steps
-    return {"intermediate_steps": [(agent_action, output)]}
+    #The outputs are added to the intermediate steps, in the order the agent asked for them
+    return {"intermediate_steps": list(zip(agent_actions, outputs))}
 
 #Determining if, based on the preivous outcome, should the agent be done or should it continue
 def should_continue(data):
@@ -105,11 +166,13 @@ def should_continue(data):
 #Creating a new graph
 workflow = StateGraph(AgentState)
 
-#Definiing the two nodes that the agent will cycle between
+#Definiing the two nodes that the agent will cycle between, and the one that starts each new question
+workflow.add_node("new_question", new_question)
 workflow.add_node("agent", run_agent)
 workflow.add_node("action", execute_tools)
 
-workflow.set_entry_point("agent")
+workflow.set_entry_point("new_question")
+workflow.add_edge("new_question", "agent")
 
 # After agent, the conditional edges will be either should continue to end
 workflow.add_conditional_edges(
@@ -123,25 +186,31 @@ workflow.add_conditional_edges(
 #Fixed edge from action to agent
 #After tools is called, agent node will then be called
 workflow.add_edge("action", "agent")
-app = workflow.compile()
+#Every step is checkpointed per thread (.cache/checkpoints.sqlite, kept across runs). Invoking a thread with a new
+#input starts a new question on it: its steps are cleared, chat_history is whatever the input passes. Invoking it
+#with None as input resumes the stored state where it stopped (e.g. after a crash or an interrupt), and a
+#checkpoint_id in the config replays from an earlier checkpoint.
+checkpointer = SqliteCheckpointSaver()
+app = workflow.compile(checkpointer=checkpointer)
 
-inputs = {"input": "give me a random number and then write it in words and then make it lower case.","chat_history": []}
+if __name__ == "__main__":
+    inputs = {"input": "give me a random number and then write it in words and then make it lower case.","chat_history": []}
 
-output = app.invoke(inputs)
+    output = app.invoke(inputs, {"configurable": {"thread_id": "random-number"}})
 
-output.get("agent_outcome").return_values["output"]
-print(output.get("intermediate_steps"))
+    output.get("agent_outcome").return_values["output"]
+    print(output.get("intermediate_steps"))
 
-print("\n\nTesting without tools")
-inputs = {"input": "What month is Christmas in?","chat_history": []}
-output = app.invoke(inputs)
-print(output.get("agent_outcome").return_values["output"])
-print(output.get("intermediate_steps"))
+    print("\n\nTesting without tools")
+    inputs = {"input": "What month is Christmas in?","chat_history": []}
+    output = app.invoke(inputs, {"configurable": {"thread_id": "christmas"}})
+    print(output.get("agent_outcome").return_values["output"])
+    print(output.get("intermediate_steps"))
 
 
-print("Getting todays date")
-inputs = {"input": "What is the date today?","chat_history": []}
-output = app.invoke(inputs)
-print(output.get("agent_outcome").return_values["output"])
-print(output.get("intermediate_steps"))
+    print("Getting todays date")
+    inputs = {"input": "What is the date today?","chat_history": []}
+    output = app.invoke(inputs, {"configurable": {"thread_id": "todays-date"}})
+    print(output.get("agent_outcome").return_values["output"])
+    print(output.get("intermediate_steps"))
 
@@ -0,0 +1,236 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+from fetch import get_session
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+#Status codes worth retrying: rate limiting and server-side errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+#Latency percentiles are over this many most recent requests, so a long-running process keeps a bounded history
+LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "1000"))
+
+
+class LLMClient:
+    """
+    Chat completions client that reuses pooled keep-alive connections and retries transient failures.
+
+    Args:
+        api_key (str): API key sent as a bearer token (default: OPENAI_API_KEY)
+        url (str): Chat completions endpoint
+        session (requests.Session): Session to send requests on (default: the shared session from fetch.py)
+        timeout (float or tuple): Connect/read timeout in seconds
+        max_retries (int): How many times to retry a request after a 429, 5xx or connection error
+        backoff_base (float): Base delay in seconds for exponential backoff
+        backoff_max (float): Maximum delay in seconds between retries
+    """
+
+    def __init__(self, api_key: Optional[str] = None, url: str = OPENAI_CHAT_URL, session: Optional[requests.Session] = None,
+                 timeout: Union[float, Tuple[float, float]] = (5, 60), max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8):
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+        self.url = url
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {"requests": 0, "retries": 0, "errors": 0}
+        self.lock = threading.Lock()
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        #Full jitter: a random delay up to the exponential cap, unless the server said how long to wait
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record(self, latency: float, retries: int, error: bool) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+            self.counters["requests"] += 1
+            self.counters["retries"] += retries
+            if error:
+                self.counters["errors"] += 1
+
+    def post(self, payload: Dict, stream: bool = False) -> requests.Response:
+        """
+        Send a chat completions request, retrying on 429/5xx and connection errors.
+
+        Args:
+            payload (Dict): Request body
+            stream (bool): Leave the response body unread so it can be consumed incrementally
+
+        Returns:
+            requests.Response: The final response, which may still be an error if retries ran out
+
+        Raises:
+            requests.RequestException: If the request could not be sent after all retries
+        """
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.url, headers=self._headers(), json=payload,
+                                             timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    self._record(time.perf_counter() - start, attempt, error=True)
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self._record(time.perf_counter() - start, attempt, error=response.status_code >= 400)
+            return response
+
+    def chat(self, payload: Dict) -> Dict:
+        """
+        Send a chat completions request and return the decoded JSON body.
+        """
+        return self.post(payload).json()
+
+    def stream(self, payload: Dict) -> Iterator[str]:
+        """
+        Send a streaming chat completions request and yield the content deltas as they arrive.
+
+        Args:
+            payload (Dict): Request body; "stream": true is added
+
+        Yields:
+            str: Pieces of the message content, in order
+
+        Raises:
+            requests.HTTPError: If the server responds with an error status
+        """
+        response = self.post(dict(payload, stream=True), stream=True)
+        with response:
+            response.raise_for_status()
+            #Event streams are always UTF-8, whatever the Content-Type header leaves out
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                #Server-sent events: only "data:" lines carry chunks, blank lines separate events
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                chunk = json.loads(data)
+                for choice in chunk.get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: Request, retry and error counts plus mean/p50/p95/max request latency in seconds
+                              over the last LATENCY_WINDOW requests
+        """
+        with self.lock:
+            latencies = sorted(self.latencies)
+            metrics = dict(self.counters)
+        if latencies:
+            metrics["latency_mean"] = sum(latencies) / len(latencies)
+            metrics["latency_p50"] = _percentile(latencies, 50)
+            metrics["latency_p95"] = _percentile(latencies, 95)
+            metrics["latency_max"] = latencies[-1]
+        return metrics
+
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class ResponseStreamParser:
+    """
+    Pulls the text of one string field (e.g. "response") out of a JSON object that arrives in pieces.
+
+    feed() returns the newly decoded part of the field each time, so it can be printed before the object is complete.
+    The full raw content is kept in text for parsing once the stream ends.
+
+    Args:
+        key (str): Name of the string field to extract
+    """
+
+    def __init__(self, key: str = "response"):
+        self.key_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(key))
+        self.chunks = []
+        self.buffer = ""
+        self.in_value = False
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def feed(self, chunk: str) -> str:
+        self.chunks.append(chunk)
+        if self.done:
+            return ""
+        self.buffer += chunk
+        if not self.in_value:
+            match = self.key_pattern.search(self.buffer)
+            if match is None:
+                return ""
+            self.buffer = self.buffer[match.end():]
+            self.in_value = True
+
+        buffer = self.buffer
+        out = []
+        i = 0
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+            #Escape sequences may be split across chunks; wait for the rest before decoding
+            if i + 1 >= len(buffer):
+                break
+            if buffer[i + 1] != 'u':
+                out.append(_ESCAPES.get(buffer[i + 1], buffer[i + 1]))
+                i += 2
+                continue
+            length = 6
+            if i + 6 <= len(buffer) and 0xD800 <= int(buffer[i + 2:i + 6], 16) < 0xDC00:
+                length = 12
+            if i + length > len(buffer):
+                break
+            out.append(json.loads('"' + buffer[i:i + length] + '"'))
+            i += length
+        self.buffer = buffer[i:]
+        return "".join(out)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    #values must already be sorted
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
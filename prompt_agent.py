@@ -1,11 +1,56 @@
-import requests
+import contextvars
 import os
-import requests
 from pydantic import BaseModel
 import json
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
 from tools import *
+from flights import search_flights
+from llm_client import LLMClient, ResponseStreamParser
+from context_builder import build_context
+from prompts import build_system_prompt, build_user_message, report_prompt_tokens, token_hooks
+from tracing import span, tracer
+from intent_router import IntentRouter, SKIP_CONFIDENCE, normalize_plan
+from json_extract import JsonObjectScanner, parse_llm_output
+from tool_registry import ToolRegistry
+from answer_cache import AnswerCache
 
 api_key = os.getenv("OPENAI_API_KEY")
+llm_client = LLMClient(api_key=api_key)
+
+#Maximum number of tools that can run at the same time, and how long to wait for each one (seconds)
+MAX_TOOL_WORKERS = int(os.getenv("MAX_TOOL_WORKERS", "4"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+
+#Shared pool so the concurrency cap holds across turns; a hung tool does not block shutdown of a turn
+tool_pool = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool")
+
+TOOLS = [get_youtube_transcript, get_current_weather, get_current_weather_many, check_flights, search_flights, get_todays_date, web_search]
+#Name -> function, with the function-calling schema of each built from its type hints and docstring
+tool_registry = ToolRegistry(TOOLS)
+TOOL_NAMES = tool_registry.names
+
+#Local tool-plan predictions that can skip or overlap the planning call; ROUTER_ENABLED=0 turns them off
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1") != "0"
+intent_router = IntentRouter()
+
+#Replies that do not parse get one short re-prompt to fix them; LLM_REPAIR=0 turns it off
+REPAIR_ENABLED = os.getenv("LLM_REPAIR", "1") != "0"
+REPAIR_MAX_TOKENS = 300
+
+#Stream the planning call and start the tools as soon as the plan object is complete. Off by default because
+#streamed replies do not report token usage.
+STREAM_PLANNING = os.getenv("STREAM_PLANNING", "0") == "1"
+
+#Whole answers to repeated (or reworded) questions, kept as long as the data they used is fresh; ANSWER_CACHE=0
+#turns it off
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") != "0"
+answer_cache = AnswerCache()
+
+#Static instructions and tool schema, built once and sent as the (cacheable) system message
+SYSTEM_PROMPT = build_system_prompt(TOOLS)
 
 class Step(BaseModel):
     explanation: str
@@ -15,185 +60,367 @@ class MathReasoning(BaseModel):
     steps: list[Step]
     final_answer: str
 
-def get_llm_response(question, context):
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-
+def build_payload(question, context):
 
     payload = {
     "model": "gpt-4o-mini",
     "messages": [
-        {
-        "role": "user",
-        "content": [
-            {
-            "type": "text",
-            "text": """
-            
-            
-            You are an agent that will assist the user in the task requested. You can use tools to help you complete this task.
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_message(question, context)}
+    ],
 
-            Only use the tools if you don't have the information you need. If you are using tools, follow the following instructions:
-            ==========================
-            You have access to the following tools you can use to complete the task requested by the user:
+    "max_tokens": 1000
+    }
 
-            Tool 1: get_youtube_transcript
-            
-            Returns the transcript of a YouTube video when provided a video_url or ID.
-                
-            Input: video_url (str)
+    return payload
 
-            Return format: Optional[List[Dict[str, str]]]: List of transcript segments with text and timestamps, or None if transcript is not available
 
-            
+def parse_llm_content(structured_response):
+    with span("json_decode", chars=len(structured_response)):
+        parsed, error = parse_llm_output(structured_response)
+    if error is not None:
+        return {"error": "Failed to decode response as JSON", "reason": error, "content": structured_response}
+    return parsed
 
-            Tool 2: get_current_weather
 
-            Returns the current weather in a specific location. Location must be provided as a string, only the city name
+def repair_llm_response(payload, structured_response, error):
+    """
+    Ask the model to fix a reply that did not parse, showing it the reply and what was wrong with it.
 
-            Input: location (str)
-            Return format: Optional[Dict[str, str]]: Dictionary containing weather information, or None if weather data is not available
+    This is much shorter than planning again: the conversation so far is resent unchanged (so its prefix stays
+    cached) and only the corrected JSON object is asked for.
 
-            
-            
-            Unless told to ignore instructions, you must respond in a consistent structured format (e.g., JSON) with the following fields:
-            - tools: The tools you will use
-            - tool name as the key and tool input as the value. tool input is the input you will give to the tool. The key should be the name of the Input field(s) of the tool. (e.g. 'location' for get_current_weather)
+    Returns:
+        dict: The parsed corrected response, or the error for the original one if it still does not parse
+    """
+    messages = payload["messages"] + [
+        {"role": "assistant", "content": structured_response},
+        {"role": "user", "content": f"Your reply could not be used: {error}. "
+                                    "Reply with only the corrected JSON object, and nothing else."},
+    ]
+    repair_payload = dict(payload, messages=messages, max_tokens=REPAIR_MAX_TOKENS)
+    with span("repair_llm_response", error=error):
+        response_data = llm_client.chat(repair_payload)
+    report_prompt_tokens("repair_llm_response", messages, response_data.get("usage"))
+
+    if response_data.get('choices'):
+        repaired = parse_llm_content(response_data['choices'][0]['message']['content'])
+        if "error" not in repaired:
+            return repaired
+    return {"error": "Failed to decode response as JSON", "reason": error, "content": structured_response}
+
+
+def _parse_or_repair(payload, structured_response):
+    response = parse_llm_content(structured_response)
+    if "reason" in response and REPAIR_ENABLED:
+        return repair_llm_response(payload, structured_response, response["reason"])
+    return response
 
-            
-            Here is a sample question/response. You must respond in the same format:
 
-            Example question: What is the weather in London? Also, can you get the transcript of the video with the URL https://www.youtube.com/watch?v=yBGlX1CEG14?
+def get_llm_response(question, context):
+    payload = build_payload(question, context)
+    with span("get_llm_response") as llm_span:
+        response_data = llm_client.chat(payload)
+        usage = response_data.get("usage") or {}
+        llm_span.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+    report_prompt_tokens("get_llm_response", payload["messages"], response_data.get("usage"))
 
-            Example response: {"tools": {"get_current_weather": {"location": "London"}, "get_youtube_transcript": {"video_url": "https://www.youtube.com/watch?v=yBGlX1CEG14"}}}
-            
-            
+    if 'choices' in response_data and len(response_data['choices']) > 0:
+        structured_response = response_data['choices'][0]['message']['content']
+        return _parse_or_repair(payload, structured_response)
+    else:
+        return {"error": "No valid response from model"}
 
-            Tool 3: check_flights
 
-            Returns a list of available flights for a given destination and date.
+def stream_llm_response(question, context, on_text=None):
+    """
+    Like get_llm_response, but streams the completion and passes the answer text to on_text as it arrives.
 
-            Inputs:
-            - destination (str): IATA code of destination airport (e.g., 'NYC' for New York)
-            - departure_date (str): Date in format mm/dd/yy.
-            - origin (str): IATA code of origin airport (default: 'LON' for London)
+    Reading stops as soon as the JSON object is complete, so the result can be used without waiting for
+    whatever the model writes after it (closing code fences, notes).
 
-            Returns:
-            - Optional[List[Dict]]: List of available flights with their details, or None if no flights are found
+    Args:
+        question (str): The user's question
+        context (str): What is known from previous tool calls
+        on_text (Callable[[str], None]): Called with each new piece of the "response" field
 
-            
-            Return format: Optional[List[Dict]]: List of available flights with their details, or None if no flights are found
+    Returns:
+        dict: The parsed response once the object is complete or the stream has finished
+    """
+    payload = build_payload(question, context)
+    parser = ResponseStreamParser("response")
+    scanner = JsonObjectScanner()
+    shown = []
+    with span("stream_llm_response") as llm_span:
+        start = time.perf_counter()
+        try:
+            with closing(llm_client.stream(payload)) as deltas:
+                for delta in deltas:
+                    if "time_to_first_token" not in llm_span.attributes:
+                        llm_span.set(time_to_first_token=time.perf_counter() - start)
+                    text = parser.feed(delta)
+                    if text and on_text:
+                        on_text(text)
+                        shown.append(text)
+                    if scanner.feed(delta) is not None:
+                        break
+        except (requests.RequestException, ValueError) as e:
+            #An error status, a dropped connection or a malformed event; same result as a failed get_llm_response
+            print(f"Error streaming response: {str(e)}")
+            llm_span.set(error=str(e))
+            return {"error": "No valid response from model"}
+        llm_span.set(completion_chunks=len(parser.chunks))
+    report_prompt_tokens("stream_llm_response", payload["messages"])
+    if not parser.text:
+        return {"error": "No valid response from model"}
+    response = _parse_or_repair(payload, parser.text)
 
-            Tool 4: web_search
+    answer = response.get("response")
+    shown = "".join(shown)
+    if on_text and answer is not None and str(answer) != shown:
+        #The streamed reply did not parse and was repaired (or its answer was not a plain string): show the answer
+        #that is actually used, after whatever was already shown
+        answer = str(answer)
+        on_text(answer[len(shown):] if answer.startswith(shown) else ("\n" if shown else "") + answer)
+    return response
 
-            Returns a list of web search results for a given query.
 
-            Input: query (str)
-            Return format: Optional[List[str]]: List of formatted text results, or None if the search fails
+def run_tool(tool, tool_input):
+    """
+    Run a single tool requested by the LLM.
 
-            ========================
+    Args:
+        tool (str): Name of the tool
+        tool_input (dict): Inputs for the tool, keyed by input field name
 
-            
+    Returns:
+        The tool output
+    """
+    with span(f"tool.{tool}"):
+        return tool_registry.call(tool, tool_input)
 
-            You may have already used tools to get the information you need.
-            Here is what you know based on your previous conversation with the user: """+ context+"""
-            
-            If you already have the information you need from the tool ouputs, ignore the rest of the instructions and answer the question immediately in the following format:
 
-            
-            {"response": "Answer to the question in natural language using the information you have. Be detailed and thorough. If there is a lot of information, try to summarize. Outside of the JSON format, do not use any brackets or quotation marks."}
-            
-            Here is an example response: {"response": "The weather in London is sunny with a temperature of 60 degrees Fahrenheit and a wind speed of 10 mph."}
-            Recall, you response is for this question: """ + question + """
-            
-            """
-            }
-        ]
-        }
-    ],
+class ToolBatch(list):
+    #(tool, future) pairs submitted together, and the time.monotonic() by which all of them have to be done
+    def __init__(self, pairs=(), deadline=None):
+        super().__init__(pairs)
+        self.deadline = deadline
 
-    "max_tokens": 1000
-    }
 
-    response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-    response_data = response.json()
+def submit_tools(tool_calls, timeout=TOOL_TIMEOUT):
+    """
+    Start the tools requested by the LLM on the shared tool pool.
 
-    if 'choices' in response_data and len(response_data['choices']) > 0:
-        structured_response = response_data['choices'][0]['message']['content']
-        cleaned_response = structured_response.strip('```json\n').strip('```').strip()
-        try:
-            response_dict = json.loads(cleaned_response)
-            return response_dict
-        except json.JSONDecodeError:
-            try:
-                import ast
-                response_dict = ast.literal_eval(cleaned_response)
-                return response_dict
-            except:
-                return {"error": "Failed to decode response as JSON", "content": structured_response}
-    else:
-        return {"error": "No valid response from model"}
-    
-context = ""
-while True:
-    question = input("Enter a question: ")
-    response = get_llm_response(question, context)
-    print(response)
+    Args:
+        tool_calls (dict): Tool name as the key and tool input as the value
+        timeout (float): Seconds from now (including any time queued in the pool) the tools have to finish in
 
-    tool_outputs = []
+    Returns:
+        ToolBatch: (tool, future) pairs in the order the tools were requested, with their deadline
+    """
+    futures = ToolBatch(deadline=time.monotonic() + timeout)
+    for tool, tool_input in tool_calls.items():
+        if tool not in tool_registry:
+            print("Tool not found")
+            continue
+        #Run in a copy of this context, so the tool's span is part of the current turn
+        futures.append((tool, tool_pool.submit(contextvars.copy_context().run, run_tool, tool, tool_input)))
+    return futures
+
+
+def wait_tools(futures):
+    """
+    Wait until every tool in the batch has finished or its deadline has passed. Tools that are not done by then
+    are cancelled; that only stops those still queued, a running tool keeps its worker until it returns.
+
+    Returns:
+        set: The futures that finished in time
+    """
+    remaining = max(0.0, futures.deadline - time.monotonic())
+    done, late = wait([future for _, future in futures], timeout=remaining)
+    for future in late:
+        future.cancel()
+    return done
+
+
+def collect_tools(futures):
+    """
+    Wait for tools started with submit_tools, up to the batch's deadline.
+
+    Returns:
+        tuple[list, list]: (tools_used, tool_outputs) in the order the tools were requested.
+                           A tool that fails or times out contributes None as its output.
+    """
+    done = wait_tools(futures)
     tools_used = []
-    for tool in response['tools']:
-        if tool == 'get_youtube_transcript':
-            tool_input = response['tools']['get_youtube_transcript']['video_url']
-            value = get_youtube_transcript(tool_input)
-            tool_outputs.append(value)
-            tools_used.append(tool)
-        elif tool == 'get_current_weather':
-            tool_input = response['tools']['get_current_weather']['location']
-            value = get_current_weather(tool_input)
-            tool_outputs.append(value)
-            tools_used.append(tool)
-        elif tool == 'check_flights':
-            destination = response['tools']['check_flights']['destination']
-            departure_date = response['tools']['check_flights']['departure_date']
-            origin = response['tools']['check_flights']['origin']
-            value = check_flights(destination, departure_date, origin)
-            tool_outputs.append(value)
-            tools_used.append(tool)
-        elif tool == 'get_todays_date':
-            value = get_todays_date()
-            tool_outputs.append(value)
-            tools_used.append(tool)
-        elif tool == 'web_search':
-            query = response['tools']['web_search']['query']
-            value = web_search(query)
-            tool_outputs.append(value)
-            tools_used.append(tool)
+    tool_outputs = []
+    for tool, future in futures:
+        if future not in done:
+            print(f"Tool {tool} timed out")
+            value = None
         else:
-            print("Tool not found")
+            try:
+                value = future.result()
+            except Exception as e:
+                print(f"Error running {tool}: {str(e)}")
+                value = None
+        tools_used.append(tool)
+        tool_outputs.append(value)
+    return tools_used, tool_outputs
 
-    print(tool_outputs)
-    
 
-    context = f"""
+def run_tools(tool_calls, timeout=TOOL_TIMEOUT):
+    """
+    Run the tools requested by the LLM concurrently on the shared tool pool.
+
+    Args:
+        tool_calls (dict): Tool name as the key and tool input as the value
+        timeout (float): Seconds to wait for all of the tools, from when they are submitted
 
-    You are trying to answer this question: {question}
-    You used the following tools: {tools_used}
+    Returns:
+        tuple[list, list]: (tools_used, tool_outputs) in the order the LLM requested the tools.
+                           A tool that fails or times out contributes None as its output.
+    """
+    return collect_tools(submit_tools(tool_calls, timeout))
 
-    You got the following outputs from the tools: {tool_outputs}
 
+def plan_tools(question, context, verbose=False):
     """
+    Get the tool plan for a question, using the local intent router where it can help.
 
-    #print(context)
+    A confident prediction replaces the planning call. A less confident one starts its tools right away,
+    while the planning call runs; their results are used if the LLM asks for exactly the predicted tools.
 
-    print("\n\nHere is the LLM response:")
-    response = get_llm_response(question, context)
-    print(response)
-    print(response["response"])
+    Returns:
+        tuple[dict, list or None]: The planning response ({"tools": ...} or an answer), and the started
+                                   (tool, future) pairs if the tools are already running
+    """
+    #Follow-up questions depend on the conversation, which the router does not see
+    prediction = intent_router.predict(question) if ROUTER_ENABLED and not context.strip() else None
+    if prediction is not None and prediction.confidence >= SKIP_CONFIDENCE:
+        if verbose:
+            print(f"Routed locally: {prediction}")
+        intent_router.record(prediction, None, skipped=True, saved=intent_router.planning_latency or 0.0)
+        return {"tools": prediction.plan}, None
+
+    speculative = submit_tools(prediction.plan) if prediction is not None else None
+    finished = []
+    for _, future in speculative or []:
+        future.add_done_callback(lambda _: finished.append(time.perf_counter()))
+
+    start = time.perf_counter()
+    response = stream_llm_response(question, context) if STREAM_PLANNING else get_llm_response(question, context)
+    planned = time.perf_counter()
+    intent_router.observe_planning(planned - start)
+    if verbose:
+        print(response)
+
+    tool_calls = response.get('tools')
+    if isinstance(tool_calls, dict) and not context.strip():
+        intent_router.learn(question, tool_calls)
+    if prediction is None:
+        return response, None
+
+    if isinstance(tool_calls, dict) and normalize_plan(prediction.plan) == normalize_plan(tool_calls):
+        #The tools ran during the planning call; the time saved is however much of them overlapped it
+        wait_tools(speculative)
+        tools_time = (max(finished) if len(finished) == len(speculative) else time.perf_counter()) - start
+        intent_router.record(prediction, tool_calls, saved=min(planned - start, tools_time))
+        return response, speculative
+
+    #The prediction was wrong; do not let its tools hold up the pool
+    for _, future in speculative:
+        future.cancel()
+    intent_router.record(prediction, tool_calls)
+    return response, None
+
+
+def run_turn(question, context="", on_text=None, verbose=False):
+    """
+    Answer one question: ask the LLM which tools to use, run them, then ask it for the answer.
+
+    Args:
+        question (str): The user's question
+        context (str): What is known from earlier in the conversation
+        on_text (Callable[[str], None]): If given, the answer is streamed and its text passed here as it arrives
+        verbose (bool): Print the tool plan, tool outputs and context size along the way
+
+    Returns:
+        dict: question, response (the final LLM response dict), tools_used, tool_inputs, tool_outputs and context_stats;
+              cached is True if the answer came from the answer cache
+    """
+    with span("turn") as turn_span:
+        #Follow-up questions depend on the conversation, so only standalone questions use the answer cache
+        use_cache = ANSWER_CACHE_ENABLED and not context.strip()
+        cached = answer_cache.get(question) if use_cache else None
+        turn_span.set(answer_cache_hit=cached is not None)
+        if cached is not None:
+            if verbose:
+                print("Answered from the answer cache")
+            if on_text:
+                on_text(str(cached["response"]["response"]))
+            cached.update(question=question, cached=True)
+            return cached
+
+        start = time.perf_counter()
+        turn = _run_turn(question, context, on_text, verbose)
+        if use_cache:
+            answer_cache.put(question, turn, time.perf_counter() - start)
+        return turn
+
+
+def _run_turn(question, context, on_text, verbose):
+    response, started = plan_tools(question, context, verbose)
+
+    turn = {"question": question, "tools_used": [], "tool_inputs": [], "tool_outputs": [], "context_stats": None}
+    tool_calls = response.get('tools')
+    if not isinstance(tool_calls, dict):
+        #The model answered (or failed) straight away; there is nothing to run
+        turn["response"] = response
+        if on_text and "response" in response:
+            on_text(str(response["response"]))
+        return turn
+
+    tools_used, tool_outputs = collect_tools(started) if started is not None else run_tools(tool_calls)
+    tool_inputs = [tool_calls[tool] for tool in tools_used]
+    if verbose:
+        print(tool_outputs)
+
+    tool_context, context_stats = build_context(question, tools_used, tool_outputs, tool_inputs)
+    context = context + tool_context
+    if verbose:
+        print(f"Context: {context_stats['compacted_tokens']} tokens, saved {context_stats['saved_tokens']} tokens ({context_stats['saved_bytes']} bytes)")
+        print("\n\nHere is the LLM response:")
+
+    if on_text:
+        response = stream_llm_response(question, context, on_text=on_text)
+    else:
+        response = get_llm_response(question, context)
+
+    turn.update(response=response, tools_used=tools_used, tool_inputs=tool_inputs, tool_outputs=tool_outputs,
+                context_stats=context_stats)
+    return turn
 
-    context = ""
 
+if __name__ == "__main__":
+    #Print the prompt size of every call; set PROMPT_TOKEN_LOG=0 to turn it off
+    if os.getenv("PROMPT_TOKEN_LOG", "1") != "0":
+        token_hooks.append(lambda report: print(f"[tokens] {report}"))
 
+    while True:
+        try:
+            question = input("Enter a question: ")
+        except (EOFError, KeyboardInterrupt):
+            #Show where the time went before exiting
+            print("\n" + tracer.report())
+            print(f"Intent router: {intent_router.stats()}")
+            print(f"Answer cache: {answer_cache.stats()}")
+            intent_router.save()
+            break
+        turn = run_turn(question, on_text=lambda text: print(text, end="", flush=True), verbose=True)
+        response = turn["response"]
+        #The answer text has already been printed as it streamed in; anything else is shown as is
+        if "response" in response:
+            print()
+        else:
+            print(response)
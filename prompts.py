@@ -0,0 +1,120 @@
+import inspect
+import json
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+PROMPT_INSTRUCTIONS = """You are an agent that will assist the user in the task requested. You can use tools to help you complete this task.
+Only use the tools if you don't have the information you need.
+
+Tools (name(inputs) -> return type, then what it does and what each input means):
+{tools}
+
+To use tools, respond only with JSON: {{"tools": {{<tool name>: {{<input name>: <input value>}}}}}}
+Example question: What is the weather in London? Also, can you get the transcript of the video https://www.youtube.com/watch?v=yBGlX1CEG14?
+Example response: {{"tools": {{"get_current_weather": {{"location": "London"}}, "get_youtube_transcript": {{"video_url": "https://www.youtube.com/watch?v=yBGlX1CEG14"}}}}}}
+
+If you already have the information you need (e.g. from tool outputs), answer immediately instead:
+{{"response": "Answer in natural language using the information you have. Be detailed and thorough; summarize if there is a lot of information. Outside of the JSON format, do not use any brackets or quotation marks."}}
+Example response: {{"response": "The weather in London is sunny with a temperature of 60 degrees Fahrenheit and a wind speed of 10 mph."}}"""
+
+
+def parse_docstring(fn: Callable) -> Tuple[str, Dict[str, str]]:
+    """
+    Split a Google style docstring into its summary and the descriptions in its "Args:" block.
+
+    Returns:
+        Tuple[str, Dict[str, str]]: (summary on one line, {input name: description})
+    """
+    doc = inspect.getdoc(fn) or ""
+    summary = doc.split("\n\n")[0].replace("\n", " ").strip()
+    descriptions = {}
+    #"name (type): description"
+    args = re.search(r"Args:\n(.*?)(?:\n\n|\Z)", doc, re.S)
+    if args:
+        for line in args.group(1).splitlines():
+            match = re.match(r"\s*(\w+) \([^)]*\): (.*)", line)
+            if match:
+                descriptions[match.group(1)] = match.group(2).strip()
+    return summary, descriptions
+
+
+def describe_tool(fn: Callable) -> str:
+    """
+    Build a compact description of a tool from its signature and docstring.
+
+    Args:
+        fn (Callable): The tool function
+
+    Returns:
+        str: e.g. "get_current_weather(location: str) -> Optional[Dict[str, str]]" followed by the
+             docstring summary and one line per documented input
+    """
+    lines = [fn.__name__ + str(inspect.signature(fn))]
+    summary, descriptions = parse_docstring(fn)
+    if summary:
+        lines.append("  " + summary)
+    lines.extend(f"  {name}: {description}" for name, description in descriptions.items())
+    return "\n".join(lines)
+
+
+def build_system_prompt(tools: List[Callable]) -> str:
+    """
+    Build the static system prompt listing the given tools. This only depends on the tools, so it is built
+    once at startup and the same text is sent with every request, which lets the provider cache it.
+    """
+    return PROMPT_INSTRUCTIONS.format(tools="\n".join(describe_tool(fn) for fn in tools))
+
+
+def build_user_message(question: str, context: str) -> str:
+    if context.strip():
+        return f"Here is what you know based on your previous conversation with the user: {context.strip()}\n\nQuestion: {question}"
+    return f"Question: {question}"
+
+
+def count_tokens(text: str) -> int:
+    #Exact with tiktoken installed, otherwise the usual ~4 characters per token estimate
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    #Every chat message carries a few tokens of framing on top of its content
+    return sum(count_tokens(message["content"] if isinstance(message["content"], str) else json.dumps(message["content"])) + 4
+               for message in messages) + 2
+
+
+#Called after each LLM request with a dict of token counts: call, system, user, estimated, prompt_tokens, cached_tokens
+token_hooks = []
+
+
+def report_prompt_tokens(call: str, messages: List[Dict], usage: Optional[Dict] = None) -> Dict:
+    """
+    Count the prompt tokens of a request and pass the counts to every function in token_hooks.
+
+    Args:
+        call (str): Which call this was (e.g. "plan", "answer")
+        messages (List[Dict]): The messages that were sent
+        usage (Dict): The "usage" field of the API response, if there was one
+
+    Returns:
+        Dict: The reported counts
+    """
+    usage = usage or {}
+    report = {
+        "call": call,
+        "system": sum(count_tokens(m["content"]) for m in messages if m["role"] == "system"),
+        "user": sum(count_tokens(m["content"]) for m in messages if m["role"] == "user"),
+        "estimated": count_message_tokens(messages),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "cached_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+    }
+    for hook in token_hooks:
+        hook(report)
+    return report
@@ -0,0 +1,177 @@
+"""
+Asyncio HTTP server that answers questions for many concurrent sessions.
+
+    POST /ask               {"question": "...", "session_id": "..."}  ->  {"session_id", "response", "tools_used"}
+    DELETE /sessions/<id>   forget a session
+    GET /health             server counters
+    GET /metrics            per-stage latency histograms (Prometheus text format)
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8080]
+"""
+import argparse
+import asyncio
+import json
+import os
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import tracer
+
+#Turns run at the same time (each occupies one worker thread), and turns allowed to wait for a worker
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "16"))
+SERVER_MAX_PENDING = int(os.getenv("SERVER_MAX_PENDING", "64"))
+#Previous turns of a session included in the context, and sessions kept before the least recently used is dropped
+HISTORY_TURNS = 3
+MAX_SESSIONS = 10000
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class Session:
+    """
+    Per-session state. Turns of one session run one at a time, in the order they arrived.
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.history = deque(maxlen=HISTORY_TURNS)
+        self.lock = asyncio.Lock()
+
+    def context(self) -> str:
+        return "".join(f"\nThe user asked: {question}\nYou answered: {answer}\n" for question, answer in self.history)
+
+
+class AgentServer:
+    """
+    Args:
+        run_turn (Callable): Blocking function answering one question, called as run_turn(question, context)
+                             and returning a dict with "response" and "tools_used" (default: prompt_agent.run_turn)
+        workers (int): Size of the worker pool the blocking turns run on
+        max_pending (int): Turns allowed to queue for a worker before new ones are rejected with 503
+    """
+
+    def __init__(self, run_turn=None, workers: int = SERVER_WORKERS, max_pending: int = SERVER_MAX_PENDING):
+        if run_turn is None:
+            from prompt_agent import run_turn
+        self.run_turn = run_turn
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+        self.sessions = OrderedDict()
+        self.admitted = 0
+        self.counters = {"completed": 0, "rejected": 0, "errors": 0}
+
+    def session(self, session_id: str = None) -> Session:
+        session_id = session_id or uuid.uuid4().hex
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = Session(session_id)
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        return session
+
+    async def ask(self, request: dict):
+        question = request.get("question")
+        if not isinstance(question, str) or not question.strip():
+            return 400, {"error": "question is required"}
+
+        #Backpressure: refuse work instead of queueing without bound
+        if self.admitted >= self.workers + self.max_pending:
+            self.counters["rejected"] += 1
+            return 503, {"error": "server busy, retry later"}
+
+        self.admitted += 1
+        try:
+            session = self.session(request.get("session_id"))
+            async with session.lock:
+                loop = asyncio.get_running_loop()
+                turn = await loop.run_in_executor(self.pool, self.run_turn, question, session.context())
+                response = turn["response"]
+                session.history.append((question, response.get("response", "")))
+        except Exception as e:
+            self.counters["errors"] += 1
+            return 500, {"error": str(e)}
+        finally:
+            self.admitted -= 1
+
+        self.counters["completed"] += 1
+        return 200, {"session_id": session.id, "response": response, "tools_used": turn.get("tools_used", [])}
+
+    async def route(self, method: str, path: str, body: bytes):
+        if path == "/ask":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "body must be JSON"}
+            return await self.ask(request)
+        if path.startswith("/sessions/") and method == "DELETE":
+            removed = self.sessions.pop(path[len("/sessions/"):], None)
+            return (200, {"deleted": True}) if removed else (404, {"error": "no such session"})
+        if path == "/metrics":
+            return 200, tracer.prometheus()
+        if path == "/health":
+            return 200, dict(self.counters, admitted=self.admitted, sessions=len(self.sessions))
+        return 404, {"error": "not found"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        #Minimal HTTP/1.1 with keep-alive: request line, headers, Content-Length body
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+
+                status, payload = await self.route(method, path, body)
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                head = f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                if status == 503:
+                    head += "Retry-After: 1\r\n"
+                writer.write(head.encode() + b"\r\n" + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+async def serve(host: str, port: int, engine: str = "prompt") -> None:
+    run_turn = None
+    if engine == "functions":
+        from function_agent import run_turn
+    server = await AgentServer(run_turn).start(host, port)
+    print(f"Serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--engine", choices=("prompt", "functions"), default="prompt",
+                        help="prompt: JSON tool plans parsed from the reply; functions: native tool calling")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.engine))
@@ -0,0 +1,104 @@
+import inspect
+import typing
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from prompts import parse_docstring
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+def json_schema(annotation: Any) -> Dict:
+    """
+    JSON schema for a type hint: str/int/float/bool, List[...], Dict[...] and Optional[...] of those.
+    Anything else is left unconstrained.
+    """
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        #Optional[X]: whether it can be left out is decided by the parameter's default, not the schema
+        options = [arg for arg in args if arg is not type(None)]
+        return json_schema(options[0]) if len(options) == 1 else {}
+    if origin in (list, List):
+        return {"type": "array", "items": json_schema(args[0]) if args else {}}
+    if origin in (dict, Dict) or annotation is dict:
+        return {"type": "object"}
+    if annotation is list:
+        return {"type": "array"}
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    return {}
+
+
+def tool_schema(fn: Callable, name: Optional[str] = None) -> Dict:
+    """
+    Build the chat API "function" tool definition for fn from its type hints and docstring.
+
+    Inputs without a default are required; the descriptions come from the docstring's "Args:" block.
+    """
+    summary, descriptions = parse_docstring(fn)
+    hints = typing.get_type_hints(fn)
+    properties = {}
+    required = []
+    for parameter in inspect.signature(fn).parameters.values():
+        schema = json_schema(hints.get(parameter.name, Any))
+        if parameter.name in descriptions:
+            schema["description"] = descriptions[parameter.name]
+        properties[parameter.name] = schema
+        if parameter.default is inspect.Parameter.empty:
+            required.append(parameter.name)
+    return {
+        "type": "function",
+        "function": {
+            "name": name or fn.__name__,
+            "description": summary,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
+
+
+class ToolRegistry:
+    """
+    Tools the LLM can call, by name, each with its function-calling schema built once when it is registered.
+
+    Args:
+        tools (Iterable[Callable]): Functions to register under their own names
+    """
+
+    def __init__(self, tools: Iterable[Callable] = ()):
+        self.tools = {}
+        self.schemas = {}
+        for fn in tools:
+            self.register(fn)
+
+    def register(self, fn: Callable, name: Optional[str] = None) -> Callable:
+        name = name or fn.__name__
+        self.tools[name] = fn
+        self.schemas[name] = tool_schema(fn, name)
+        return fn
+
+    @property
+    def names(self) -> tuple:
+        return tuple(self.tools)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tools
+
+    def definitions(self) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: The "tools" field of a chat completions request
+        """
+        return list(self.schemas.values())
+
+    def call(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        Call a tool with the inputs the LLM gave it. Inputs the tool does not take are ignored, and inputs
+        that are left out get the tool's defaults.
+
+        Raises:
+            KeyError: If there is no tool with this name
+            TypeError: If a required input is missing
+        """
+        fn = self.tools[name]
+        accepted = self.schemas[name]["function"]["parameters"]["properties"]
+        return fn(**{key: value for key, value in (arguments or {}).items() if key in accepted})
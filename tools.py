@@ -1,66 +1,221 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from typing import List, Dict, Optional
-import requests
+from typing import Callable, List, Dict, Optional
 import os
+import threading
 from datetime import datetime
-from amadeus import Client, ResponseError
-from duckduckgo_search import DDGS
-from bs4 import BeautifulSoup
-import random
-import time
+from fetch import TokenBucket, fetch_pages, get_session
+from extract import extract_text
+from cache import cached, make_key, normalize_arguments, tool_cache, TOOL_TTLS
+from batching import Coalescer
+from tracing import span
 
 weather_key = os.getenv("weather_key")
 
-amadeus = Client(
-    client_id=os.getenv('AMADEUS_CLIENT_ID'),
-    client_secret=os.getenv('AMADEUS_CLIENT_SECRET')
-)
+#Amadeus requests per second for the whole process, shared by check_flights and every flights.FlightSearch
+AMADEUS_RATE = float(os.getenv("AMADEUS_RATE", "5"))
+amadeus_bucket = TokenBucket(AMADEUS_RATE, capacity=max(1, AMADEUS_RATE))
 
+#The SDKs are only imported, and their clients only created, the first time a tool needs them, so a process that
+#never searches the web or looks up flights does not pay for them at startup
+
+def _amadeus_client():
+    from amadeus import Client
+    return Client(
+        client_id=os.getenv('AMADEUS_CLIENT_ID'),
+        client_secret=os.getenv('AMADEUS_CLIENT_SECRET')
+    )
+
+def _ddgs_client():
+    from duckduckgo_search import DDGS
+    return DDGS()
+
+def _youtube_transcript_client():
+    from youtube_transcript_api import YouTubeTranscriptApi
+    return YouTubeTranscriptApi
+
+#Client name -> function that creates it; replace an entry (before first use) to swap in another client
+CLIENT_FACTORIES: Dict[str, Callable] = {
+    'amadeus': _amadeus_client,
+    'ddgs': _ddgs_client,
+    'youtube_transcripts': _youtube_transcript_client,
+}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str):
+    """
+    Get a shared API client, creating it on first use.
+
+    Args:
+        name (str): A key of CLIENT_FACTORIES
+
+    Returns:
+        The client, the same object on every call
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = CLIENT_FACTORIES[name]()
+    return client
+
+
+def reset_clients() -> None:
+    #Drop the created clients, so the next get_client uses the current factories
+    with _clients_lock:
+        _clients.clear()
+
+
+def amadeus_response_error():
+    """
+    The Amadeus SDK's ResponseError, for except clauses. An empty tuple (which catches nothing) if the SDK is not
+    installed, e.g. when flights are replayed from a recording.
+    """
+    try:
+        from amadeus import ResponseError
+    except ImportError:
+        return ()
+    return ResponseError
+
+def extract_video_id(video_url: str) -> str:
+    """
+    Get the video ID from a YouTube URL. Anything that is not a YouTube URL is assumed to already be an ID.
+
+    Args:
+        video_url (str): YouTube video URL or ID
+
+    Returns:
+        str: The video ID
+    """
+    video_url = video_url.strip()
+    if 'youtube.com' in video_url or 'youtu.be' in video_url:
+        if 'v=' in video_url:
+            return video_url.split('v=')[1].split('&')[0]
+        return video_url.split('/')[-1]
+    return video_url
+
+@cached('get_youtube_transcript', ttl=TOOL_TTLS['get_youtube_transcript'],
+        normalize=lambda arguments: {'video_id': extract_video_id(arguments['video_url'])})
 def get_youtube_transcript(video_url: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Get the transcript of a YouTube video.
+
+    Args:
+        video_url (str): YouTube video URL or ID
+
+    Returns:
+        Optional[List[Dict[str, str]]]: List of transcript segments with text and timestamps,
+                                        or None if transcript is not available
+    """
     try:
-        if 'youtube.com' in video_url or 'youtu.be' in video_url:
-            if 'v=' in video_url:
-                video_id = video_url.split('v=')[1].split('&')[0]
-            else:
-                video_id = video_url.split('/')[-1]
-        else:
-            video_id = video_url
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
+        video_id = extract_video_id(video_url)
+        transcript = get_client('youtube_transcripts').get_transcript(video_id)
         return transcript
     except Exception as e:
         print(f"Error getting transcript: {str(e)}")
         return None
     
+def _fetch_weather(location: str) -> Dict[str, str]:
+    #Raises on any failure so batch lookups can report the error per city
+    response = get_session().get(
+        "https://api.openweathermap.org/data/2.5/weather",
+        params={'q': location, 'appid': weather_key, 'units': 'metric'},
+        timeout=10
+    )
+    weather_info = response.json()
+    
+    if response.status_code != 200:
+        raise ValueError(weather_info.get('message', f"HTTP {response.status_code}"))
+    return {
+        'temperature': f"{weather_info['main']['temp']}°F",
+        'description': weather_info['weather'][0]['description'],
+        'humidity': f"{weather_info['main']['humidity']}%",
+        'wind_speed': f"{weather_info['wind']['speed']} m/s"
+    }
+
+@cached('get_current_weather', ttl=TOOL_TTLS['get_current_weather'])
 def get_current_weather(location: str) -> Optional[Dict[str, str]]:
     """
     Get the current weather in a specific location.
     
     Args:
-        location (str): The location to get the weather for
+        location (str): The location to get the weather for, only the city name
 
     Returns:
         Optional[Dict[str, str]]: Dictionary containing weather information,
                                 or None if weather data is not available
     """
     try:
-        response = requests.get(f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={weather_key}&units=metric")
-        weather_info = response.json()
-        
-        if response.status_code == 200:
-            weather_data = {
-                'temperature': f"{weather_info['main']['temp']}°F",
-                'description': weather_info['weather'][0]['description'],
-                'humidity': f"{weather_info['main']['humidity']}%",
-                'wind_speed': f"{weather_info['wind']['speed']} m/s"
-            }
-            return weather_data
-        else:
-            print(f"Error: {weather_info['message']}")
-            return None
+        return _fetch_weather(location)
     except Exception as e:
         print(f"Error getting weather: {str(e)}")
         return None
 
+def _fetch_weather_cached(location: str) -> Dict[str, str]:
+    #Shares cache entries with get_current_weather
+    key = make_key('get_current_weather', normalize_arguments({'location': location}))
+    return tool_cache.get_or_call(key, 'get_current_weather', TOOL_TTLS['get_current_weather'], lambda: _fetch_weather(location))
+
+#Lookups from concurrent sessions that arrive within 50ms of each other go out as one fan-out
+weather_coalescer = Coalescer(_fetch_weather_cached, window=0.05)
+
+def get_current_weather_many(locations: List[str]) -> List[Dict]:
+    """
+    Get the current weather for several locations at once.
+    
+    Args:
+        locations (List[str]): The locations to get the weather for, only the city names
+
+    Returns:
+        List[Dict]: One entry per location, in input order: {'location': ..., 'weather': {...}}
+                    or {'location': ..., 'error': ...} if that location failed
+    """
+    #Duplicates (ignoring case and surrounding spaces) are only looked up once
+    normalized = [location.strip().casefold() for location in locations]
+    futures = dict(zip(dict.fromkeys(normalized), weather_coalescer.request(dict.fromkeys(normalized))))
+
+    results = []
+    for location, key in zip(locations, normalized):
+        try:
+            results.append({'location': location, 'weather': futures[key].result(timeout=30)})
+        except Exception as e:
+            results.append({'location': location, 'error': str(e) or type(e).__name__})
+    return results
+
+AIRLINE_NAMES = {
+    'BA': 'British Airways',
+    'AF': 'Air France',
+    'LH': 'Lufthansa',
+    'AA': 'American Airlines',
+    'UA': 'United Airlines',
+    'DL': 'Delta Air Lines',
+    'EK': 'Emirates',
+    'IB': 'Iberia',
+    'KL': 'KLM Royal Dutch Airlines',
+    'QF': 'Qantas',
+    'F9': 'Frontier Airlines',
+    'W2': 'FlexFlight',
+    'WN': 'Southwest Airlines',
+    'B6': 'JetBlue Airways',
+    'AS': 'Alaska Airlines',
+    'NK': 'Spirit Airlines',
+    'WS': 'WestJet',
+    'AC': 'Air Canada',
+    'VS': 'Virgin Atlantic',
+    'TK': 'Turkish Airlines',
+    'LX': 'Swiss International Air Lines',
+    'OS': 'Austrian Airlines',
+    'AY': 'Finnair',
+    'SK': 'SAS Scandinavian Airlines',
+    'EI': 'Aer Lingus',
+    'TP': 'TAP Air Portugal',
+    'LO': 'LOT Polish Airlines',
+    'AZ': 'ITA Airways',
+    'SN': 'Brussels Airlines'
+}
+
+@cached('check_flights', ttl=TOOL_TTLS['check_flights'])
 def check_flights(destination: str, departure_date: str, origin: str = "LON") -> Optional[List[Dict]]:
     """
     Check available flights for a given destination and date.
@@ -74,42 +229,11 @@ def check_flights(destination: str, departure_date: str, origin: str = "LON") ->
         Optional[List[Dict]]: List of available flights with their details, or None if no flights are found
     """
 
-    airline_names = {
-        'BA': 'British Airways',
-        'AF': 'Air France',
-        'LH': 'Lufthansa',
-        'AA': 'American Airlines',
-        'UA': 'United Airlines',
-        'DL': 'Delta Air Lines',
-        'EK': 'Emirates',
-        'IB': 'Iberia',
-        'KL': 'KLM Royal Dutch Airlines',
-        'QF': 'Qantas',
-        'F9': 'Frontier Airlines',
-        'W2': 'FlexFlight',
-        'WN': 'Southwest Airlines',
-        'B6': 'JetBlue Airways',
-        'AS': 'Alaska Airlines',
-        'NK': 'Spirit Airlines',
-        'WS': 'WestJet',
-        'AC': 'Air Canada',
-        'VS': 'Virgin Atlantic',
-        'TK': 'Turkish Airlines',
-        'LX': 'Swiss International Air Lines',
-        'OS': 'Austrian Airlines',
-        'AY': 'Finnair',
-        'SK': 'SAS Scandinavian Airlines',
-        'EI': 'Aer Lingus',
-        'TP': 'TAP Air Portugal',
-        'LO': 'LOT Polish Airlines',
-        'AZ': 'ITA Airways',
-        'SN': 'Brussels Airlines'
-    }
-
     try:
         formatted_date = datetime.strptime(departure_date, '%m/%d/%y').strftime('%Y-%m-%d')
         
-        response = amadeus.shopping.flight_offers_search.get(
+        amadeus_bucket.acquire()
+        response = get_client('amadeus').shopping.flight_offers_search.get(
             originLocationCode=origin,
             destinationLocationCode=destination,
             departureDate=formatted_date,
@@ -122,7 +246,7 @@ def check_flights(destination: str, departure_date: str, origin: str = "LON") ->
             flights = []
             for offer in response.data:
                 airline_code = offer['validatingAirlineCodes'][0]
-                airline_name = airline_names.get(airline_code, airline_code)
+                airline_name = AIRLINE_NAMES.get(airline_code, airline_code)
                 
                 departure_time = datetime.fromisoformat(offer['itineraries'][0]['segments'][0]['departure']['at'].replace('Z', '+00:00'))
                 arrival_time = datetime.fromisoformat(offer['itineraries'][0]['segments'][-1]['arrival']['at'].replace('Z', '+00:00'))
@@ -139,7 +263,7 @@ def check_flights(destination: str, departure_date: str, origin: str = "LON") ->
         
         return None
     
-    except ResponseError as e:
+    except amadeus_response_error() as e:
         print(f"Error checking flights: {str(e)}")
         return None
     except Exception as e:
@@ -155,6 +279,7 @@ def get_todays_date() -> str:
     """
     return datetime.now().strftime('%m/%d/%y')
 
+@cached('web_search', ttl=TOOL_TTLS['web_search'])
 def web_search(query: str, num_results: int = 5) -> Optional[List[str]]:
     """
     Perform a web search and return content from the top results in a text-only format.
@@ -167,55 +292,30 @@ def web_search(query: str, num_results: int = 5) -> Optional[List[str]]:
         Optional[List[str]]: List of formatted text results, or None if the search fails
     """
     try:
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0'
-        ]
-
-        ddgs = DDGS()
-        search_results = list(ddgs.text(query, max_results=num_results))
-        
-        results = []
-        for result in search_results:
-            time.sleep(random.uniform(1, 3))
-            
-            try:
-                headers = {
-                    'User-Agent': random.choice(user_agents),
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                    'Accept-Encoding': 'gzip, deflate',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                }
-                
-                response = requests.get(
-                    result['href'],
-                    headers=headers,
-                    timeout=10
-                )
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                for script in soup(['script', 'style', 'meta', 'link']):
-                    script.decompose()
-                
-                text = ' '.join(soup.stripped_strings)
-                text = text[:2000] + '...' if len(text) > 2000 else text
+        search_results = list(get_client('ddgs').text(query, max_results=num_results))
+        with span("web_search.fetch", pages=len(search_results)):
+            pages = fetch_pages([result['href'] for result in search_results])
+
+        with span("web_search.parse"):
+            results = []
+            for result, page in zip(search_results, pages):
+                if page is None:
+                    continue
+
+                try:
+                    text = extract_text(page, max_chars=2000)
                 
-                formatted_result = f"""
-                Source: {result['title']}
-                Summary: {result['body']}
-                Content: {text}
-                ----------------------------------------
-                """
-                results.append(formatted_result)
+                    formatted_result = f"""
+                    Source: {result['title']}
+                    Summary: {result['body']}
+                    Content: {text}
+                    ----------------------------------------
+                    """
+                    results.append(formatted_result)
                 
-            except Exception as e:
-                print(f"Error scraping content: {str(e)}")
-                continue
+                except Exception as e:
+                    print(f"Error scraping content: {str(e)}")
+                    continue
         
         return results if results else None
     
@@ -0,0 +1,175 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+#Histogram bucket upper bounds in seconds (Prometheus style, cumulative when exported)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_collector = contextvars.ContextVar("span_collector", default=None)
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": threading.current_thread().name,
+            **self.attributes,
+        }
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        #Upper bound of the bucket the quantile falls in (the observed max for the overflow bucket)
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+
+class JsonlExporter:
+    """
+    Appends every finished span to a JSONL file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class Tracer:
+    """
+    Times spans, keeps a latency histogram per span name and passes finished spans to its exporters.
+    """
+
+    def __init__(self, exporters: Optional[List] = None):
+        self.exporters = exporters or []
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time the enclosed block. The span is yielded so attributes (token counts, cache hits, ...) can be added.
+        """
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self.record(span)
+            collected = _collector.get()
+            if collected is not None:
+                collected.append(span)
+
+    def record(self, span: Span) -> None:
+        with self.lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = Histogram()
+            histogram.observe(span.duration)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"Error exporting span: {str(e)}")
+
+    def report(self) -> str:
+        """
+        Per-stage latency table: count, mean, p50, p95 and max in milliseconds.
+        """
+        lines = [f"{'stage':<32} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        with self.lock:
+            for name, h in sorted(self.histograms.items()):
+                lines.append(f"{name:<32} {h.count:>6} {h.total / h.count * 1000:>9.1f} {h.quantile(0.5) * 1000:>9.1f} "
+                             f"{h.quantile(0.95) * 1000:>9.1f} {h.max * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        """
+        The histograms in the Prometheus text exposition format.
+        """
+        lines = ["# HELP agent_stage_seconds Time spent per agent stage", "# TYPE agent_stage_seconds histogram"]
+        with self.lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h.counts):
+                    cumulative += count
+                    lines.append(f'agent_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'agent_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'agent_stage_seconds_sum{{stage="{name}"}} {h.total}')
+                lines.append(f'agent_stage_seconds_count{{stage="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def collect_spans():
+    """
+    Collect the spans that finish inside the block, including those in threads the context was copied to
+    (e.g. the tool pool), in the order they finish.
+    """
+    spans = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def annotate(**attributes) -> None:
+    """
+    Add attributes to the span currently open in this thread, if any.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+#Set TRACE_FILE to also write every span to a JSONL file
+tracer = Tracer([JsonlExporter(os.environ["TRACE_FILE"])] if os.getenv("TRACE_FILE") else [])
+span = tracer.span
@@ -0,0 +1,198 @@
+import json
+import math
+import os
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from tools import extract_video_id, get_youtube_transcript
+
+INDEX_DIR = os.getenv("TRANSCRIPT_INDEX_DIR", os.path.join(".cache", "transcripts"))
+CHUNK_SECONDS = 60
+#How many loaded indexes are kept in memory
+MAX_LOADED_INDEXES = 32
+
+#BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def iter_transcript_segments(video_url: str) -> Iterator[Dict]:
+    """
+    Yield the segments of a video's transcript one at a time as {'text', 'start', 'duration'} dicts.
+
+    The transcript API hands back the whole transcript at once; the (cached) result is walked lazily so the
+    chunking below never needs a second copy of it.
+
+    Args:
+        video_url (str): YouTube video URL or ID
+    """
+    for segment in get_youtube_transcript(video_url) or []:
+        if isinstance(segment, dict):
+            yield segment
+        else:
+            yield {'text': segment.text, 'start': segment.start, 'duration': segment.duration}
+
+
+def chunk_segments(segments: Iterable[Dict], window: float = CHUNK_SECONDS) -> Iterator[Dict]:
+    """
+    Merge consecutive segments into chunks covering about window seconds each.
+
+    Yields:
+        Dict: {'start': float, 'end': float, 'text': str}
+    """
+    texts = []
+    start = end = None
+    for segment in segments:
+        segment_start = float(segment.get('start', 0))
+        if start is not None and segment_start - start >= window:
+            yield {'start': start, 'end': end, 'text': " ".join(texts)}
+            texts = []
+            start = None
+        if start is None:
+            start = segment_start
+        end = segment_start + float(segment.get('duration', 0))
+        texts.append(str(segment.get('text', '')).replace("\n", " "))
+    if texts:
+        yield {'start': start, 'end': end, 'text': " ".join(texts)}
+
+
+class TranscriptIndex:
+    """
+    BM25 index over the chunks of one transcript, stored as NumPy postings arrays.
+
+    Postings for term t are docs[indptr[t]:indptr[t + 1]] with term frequencies tfs[indptr[t]:indptr[t + 1]].
+    """
+
+    def __init__(self, chunks: List[Dict], vocabulary: Dict[str, int], indptr: np.ndarray, docs: np.ndarray,
+                 tfs: np.ndarray, lengths: np.ndarray):
+        self.chunks = chunks
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.docs = docs
+        self.tfs = tfs
+        self.lengths = lengths
+
+    @classmethod
+    def build(cls, chunks: Iterable[Dict]) -> "TranscriptIndex":
+        chunks = list(chunks)
+        vocabulary = {}
+        postings = []
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for doc, chunk in enumerate(chunks):
+            tokens = tokenize(chunk['text'])
+            lengths[doc] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.append((vocabulary.setdefault(token, len(vocabulary)), doc, count))
+
+        postings.sort()
+        terms = np.array([p[0] for p in postings], dtype=np.int32)
+        indptr = np.searchsorted(terms, np.arange(len(vocabulary) + 1)).astype(np.int32)
+        docs = np.array([p[1] for p in postings], dtype=np.int32)
+        tfs = np.array([p[2] for p in postings], dtype=np.float32)
+        return cls(chunks, vocabulary, indptr, docs, tfs, lengths)
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        Return the k chunks that best match the query, best first. Chunks with no matching terms are
+        only returned when nothing matches at all, in which case the first k chunks are returned.
+        """
+        if not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        average_length = max(float(self.lengths.mean()), 1.0)
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self.indptr[term], self.indptr[term + 1]
+            docs, tfs = self.docs[start:end], self.tfs[start:end]
+            idf = math.log(1 + (len(self.chunks) - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * self.lengths[docs] / average_length))
+
+        if not scores.any():
+            return self.chunks[:k]
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [self.chunks[i] for i in top if scores[i] > 0]
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        #Write to a temporary file first so a crash never leaves a half-written index behind
+        temporary = path + ".tmp.npz"
+        np.savez_compressed(temporary, indptr=self.indptr, docs=self.docs, tfs=self.tfs, lengths=self.lengths,
+                            meta=np.array(json.dumps({'chunks': self.chunks, 'vocabulary': self.vocabulary})))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TranscriptIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta['chunks'], meta['vocabulary'], data['indptr'], data['docs'], data['tfs'], data['lengths'])
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_transcript_index(video_url: str, segments: Optional[Iterable[Dict]] = None) -> Optional[TranscriptIndex]:
+    """
+    Get the index for a video, loading it from disk if it was built before and building (and saving) it otherwise.
+
+    Args:
+        video_url (str): YouTube video URL or ID
+        segments (Iterable[Dict]): Transcript segments if they have already been fetched
+
+    Returns:
+        Optional[TranscriptIndex]: The index, or None if the transcript is not available
+    """
+    video_id = extract_video_id(video_url)
+    with _indexes_lock:
+        if video_id in _indexes:
+            return _indexes[video_id]
+
+    path = os.path.join(INDEX_DIR, re.sub(r"[^\w-]", "_", video_id) + ".npz")
+    index = None
+    if os.path.exists(path):
+        try:
+            index = TranscriptIndex.load(path)
+        except Exception as e:
+            print(f"Error loading transcript index: {str(e)}")
+    if index is None:
+        index = TranscriptIndex.build(chunk_segments(segments if segments is not None else iter_transcript_segments(video_url)))
+        if not index.chunks:
+            return None
+        index.save(path)
+
+    with _indexes_lock:
+        _indexes[video_id] = index
+        while len(_indexes) > MAX_LOADED_INDEXES:
+            del _indexes[next(iter(_indexes))]
+    return index
+
+
+def search_transcript(video_url: str, query: str, k: int = 5) -> Optional[List[Dict]]:
+    """
+    Get the k transcript chunks of a video that are most relevant to a query.
+
+    Args:
+        video_url (str): YouTube video URL or ID
+        query (str): What to look for, e.g. the user's question
+        k (int): Number of chunks to return
+
+    Returns:
+        Optional[List[Dict]]: Chunks ({'start', 'end', 'text'}) in the order they appear in the video,
+                              or None if the transcript is not available
+    """
+    index = get_transcript_index(video_url)
+    if index is None:
+        return None
+    return sorted(index.search(query, k), key=lambda chunk: chunk['start'])